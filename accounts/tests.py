@@ -1,3 +1,65 @@
-from django.test import TestCase
+import os
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from products.tests import QueryBudgetMixin
+
+
+class AccountViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Account views run a fixed number of queries, however many users exist.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("shopper", password="pw")
+
+    def _grow_users(self):
+        User.objects.bulk_create([User(username=f"user-{n}") for n in range(200)])
+
+    def test_register_form(self):
+        self.assertFlatQueries(0, lambda: self.client.get(reverse("register")), self._grow_users)
+
+    def test_register(self):
+        names = iter(["newcomer", "latecomer"])
+        self.assertFlatQueries(
+            2,
+            lambda: self.client.post(reverse("register"), {
+                "username": next(names), "email": "new@example.com",
+                "password1": "a-long-passphrase-1", "password2": "a-long-passphrase-1",
+            }),
+            self._grow_users,
+        )
+        self.assertEqual(User.objects.filter(username__in=["newcomer", "latecomer"]).count(), 2)
+
+    def test_login_form(self):
+        self.assertFlatQueries(0, lambda: self.client.get(reverse("login")), self._grow_users)
+
+    def test_login(self):
+        response = self.assertFlatQueries(
+            9,
+            # A fresh client each time, so both runs start logged out
+            lambda: Client().post(reverse("login"), {"username": "shopper", "password": "pw"}),
+            self._grow_users,
+        )
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+
+    def test_logout(self):
+        def grow():
+            self._grow_users()
+            self.client.force_login(self.user)
+
+        self.client.force_login(self.user)
+        response = self.assertFlatQueries(4, lambda: self.client.get(reverse("logout")), grow)
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+    @mock.patch.dict(os.environ, {"ADMIN_CREATE_TOKEN": "secret"})
+    def test_create_superuser_once(self):
+        self.assertFlatQueries(
+            2,
+            lambda: self.client.get(reverse("create_superuser_once"), {"token": "secret"}),
+            self._grow_users,
+        )
@@ -0,0 +1,126 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+
+
+logger = logging.getLogger("am_signature.timing")
+
+# Profile of the request being handled on this thread/task, if sampled
+_current_profile = ContextVar("server_timing_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Timings collected for one sampled request. Installed as a database
+    execute wrapper, it times every query the request runs.
+    """
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class TimedTemplate(DjangoTemplate):
+    """
+    A template that adds its render time to the sampled request's profile.
+    Templates rendered inside another (render_to_string in a tag) are
+    already counted by the outer one.
+    """
+
+    def render(self, context=None, request=None):
+        profile = _current_profile.get()
+        if profile is None or profile.rendering:
+            return super().render(context, request)
+        profile.rendering = True
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - start
+            profile.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, handing out TimedTemplate. Costs one
+    context variable lookup per render on requests that are not sampled.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class ServerTimingMiddleware:
+    """
+    Measures a sample of requests: total view time, SQL time and query
+    count, and template render time (which includes queries run lazily
+    by the template; it needs the TimedDjangoTemplates backend). Each
+    sampled request logs one line on the am_signature.timing logger; the
+    Server-Timing header, shown by the browser dev tools, is only added
+    for staff users or with DEBUG on, so visitors never see it.
+
+    SERVER_TIMING_SAMPLE_RATE is the share of requests measured (0 to 1);
+    at 0 the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, "SERVER_TIMING_SAMPLE_RATE", 0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        total = time.perf_counter() - start
+
+        user = getattr(request, "user", None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} queries"',
+                f"tpl;dur={profile.template_time * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ])
+
+        timing = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "db_ms": round(profile.db_time * 1000, 1),
+            "queries": profile.queries,
+            "template_ms": round(profile.template_time * 1000, 1),
+        }
+        logger.info(
+            " ".join(f"{key}={value}" for key, value in timing.items()),
+            extra={"timing": timing},
+        )
+        return response
@@ -8,9 +8,11 @@ Production-ready settings for Render:
 - Secrets via Environment Variables (.env locally, Render env in production)
 """
 
+from decimal import Decimal, InvalidOperation
 from pathlib import Path
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +20,23 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def _env_amount(name):
+    """
+    A money amount from the environment, parsed once at startup;
+    None when unset.
+    """
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or amount < 0:
+        raise ImproperlyConfigured(f"{name} must be an amount of at least 0, got {value!r}.")
+    return amount
+
+
 # =========================
 # SECURITY
 # =========================
@@ -59,6 +78,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # ✅ must be directly after SecurityMiddleware
+    "am_signature.middleware.ServerTimingMiddleware",  # off unless SERVER_TIMING_SAMPLE_RATE > 0
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -75,7 +95,8 @@ ROOT_URLCONF = "am_signature.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that also reports render time to ServerTimingMiddleware
+        "BACKEND": "am_signature.middleware.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -83,6 +104,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "orders.context_processors.badges",
             ],
         },
     },
@@ -92,17 +114,36 @@ WSGI_APPLICATION = "am_signature.wsgi.application"
 
 
 # =========================
-# DATABASE (Render PostgreSQL)
+# DATABASE (Render PostgreSQL, SQLite locally)
 # =========================
+DATABASE_URL = os.environ.get("DATABASE_URL") or f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+
 DATABASES = {
-    "default": dj_database_url.config(
-        default=os.environ.get("DATABASE_URL"),
+    "default": dj_database_url.parse(
+        DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True,
+        ssl_require=DATABASE_URL.startswith("postgres"),
     )
 }
 
 
+# =========================
+# CACHE (catalog pages)
+# =========================
+# The catalog version, page cache and badges are read on every request,
+# so the cache must not be the database (each read would be a query) and
+# in production must be shared by every worker and management command:
+# set CACHE_BACKEND/CACHE_LOCATION to Redis. The in-memory default is
+# per-process and only fit for development and tests; build.sh runs
+# "manage.py check --deploy", which rejects it.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+
 # =========================
 # STATIC FILES (CSS/JS/Logo)
 # =========================
@@ -110,9 +151,20 @@ STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# MEDIA_STORAGE=local keeps uploads (and image variants) on disk under
+# MEDIA_ROOT, so the image pipeline runs offline without Cloudinary.
+MEDIA_STORAGE_BACKENDS = {
+    "cloudinary": "cloudinary_storage.storage.MediaCloudinaryStorage",
+    "local": "django.core.files.storage.FileSystemStorage",
+}
+MEDIA_STORAGE = os.environ.get("MEDIA_STORAGE", "cloudinary")
+
 STORAGES = {
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": MEDIA_STORAGE_BACKENDS[MEDIA_STORAGE],
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -145,6 +197,46 @@ ADMIN_NOTIFICATION_EMAILS = os.environ.get("ADMIN_NOTIFICATION_EMAILS", "")
 ADMIN_NOTIFICATION_EMAILS = [x.strip() for x in ADMIN_NOTIFICATION_EMAILS.split(",") if x.strip()]
 EMAIL_TIMEOUT = 10
 
+# Collect new orders into one admin summary email every N minutes
+# (0 = one admin email per order). Orders totalling at least
+# ADMIN_ORDER_ALERT_THRESHOLD (euro, empty = never) still get their own email.
+ADMIN_ORDER_DIGEST_MINUTES = int(os.environ.get("ADMIN_ORDER_DIGEST_MINUTES", "0"))
+ADMIN_ORDER_ALERT_THRESHOLD = _env_amount("ADMIN_ORDER_ALERT_THRESHOLD")
+
+
+
+# =========================
+# STOCK RESERVATIONS
+# =========================
+# Adding a sized product to the cart holds the units for this long
+STOCK_RESERVATION_MINUTES = int(os.environ.get("STOCK_RESERVATION_MINUTES", "15"))
+
+# Checkout form idempotency tokens are kept this long
+CHECKOUT_TOKEN_HOURS = 24
+
+
+# =========================
+# PROFILING
+# =========================
+# Share of requests (0-1) timed by ServerTimingMiddleware: SQL, template
+# and total time go out as a log line, and as a Server-Timing header for
+# staff users (or anyone with DEBUG on).
+# 0 disables it; e.g. 0.01 is cheap enough to leave on under load.
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", "0"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "timing": {"format": "%(asctime)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "timing": {"class": "logging.StreamHandler", "formatter": "timing"},
+    },
+    "loggers": {
+        "am_signature.timing": {"handlers": ["timing"], "level": "INFO", "propagate": False},
+    },
+}
 
 
 # =========================
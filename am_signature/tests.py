@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from products.tests import seed_products
+from .middleware import ServerTimingMiddleware
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingMiddlewareTests(TestCase):
+    """
+    Sampled requests are logged with their SQL and template time; only
+    staff get the Server-Timing header.
+    """
+
+    def setUp(self):
+        seed_products(2)
+
+    def _get(self):
+        with self.assertLogs("am_signature.timing", "INFO") as logs:
+            response = self.client.get(reverse("products:product_list"))
+        self.assertEqual(len(logs.records), 1)
+        return response, logs.records[0]
+
+    def test_staff_get_the_header(self):
+        self.client.force_login(User.objects.create_user("staff", password="pw", is_staff=True))
+        response, record = self._get()
+
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn("path=/", record.getMessage())
+        self.assertGreater(record.timing["queries"], 0)
+        self.assertGreater(record.timing["template_ms"], 0)
+
+    def test_visitors_are_logged_without_the_header(self):
+        response, record = self._get()
+
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.assertEqual(record.timing["status"], 200)
+
+    @override_settings(DEBUG=True)
+    def test_debug_sends_the_header_to_everyone(self):
+        response, _ = self._get()
+        self.assertTrue(response.has_header("Server-Timing"))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_removed_when_not_sampling(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: None)
@@ -1,19 +1,191 @@
+from datetime import datetime, time, timedelta
+
+from django import forms
 from django.contrib import admin
-from .models import Cart, CartItem,Order, OrderItem
+from django.core.exceptions import PermissionDenied
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .models import (
+    Cart, CartItem, DailySales, Order, OrderDigest, OrderItem, OutboxEmail, StockReservation,
+)
+from .exports import stream_orders_csv
+from .paginators import EstimatedCountPaginator
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
+    raw_id_fields = ('product',)
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     inlines = [CartItemInline]
+    list_display = ('id', 'user', 'created_at')
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('user',)
+    # No exact COUNT(*) over the whole table on every page load
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    raw_id_fields = ('product',)
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
-    list_display = ('id', 'user', 'created_at', 'is_delivered')
+    list_display = ('id', 'user', 'created_at', 'item_count', 'subtotal', 'is_delivered')
+    list_select_related = ('user',)
+    list_filter = ('is_delivered',)
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    raw_id_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/orders/order/change_list.html"
+    actions = ['export_csv']
+
+    @admin.action(description="Export selected orders to CSV", permissions=['view'])
+    def export_csv(self, request, queryset):
+        return stream_orders_csv(queryset, "orders-selected.csv")
+
+    def get_urls(self):
+        return [
+            path(
+                'export/',
+                self.admin_site.admin_view(self.export_view),
+                name='orders_order_export',
+            ),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        """
+        Streams every order placed in a date range (inclusive) as CSV.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        form = OrderExportForm(request.GET or None)
+        if form.is_valid():
+            start, end = form.cleaned_data["start"], form.cleaned_data["end"]
+            # Range on the indexed column instead of created_at__date
+            queryset = Order.objects.filter(
+                created_at__gte=_start_of_day(start),
+                created_at__lt=_start_of_day(end + timedelta(days=1)),
+            )
+            return stream_orders_csv(queryset, f"orders-{start}-to-{end}.csv")
+
+        return TemplateResponse(request, "admin/orders/order/export.html", {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Export orders",
+            "form": form,
+        })
+
+
+class OrderExportForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("start") and cleaned.get("end") and cleaned["start"] > cleaned["end"]:
+            raise forms.ValidationError("The start date must not be after the end date.")
+        return cleaned
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'order', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('order__user',)
+    readonly_fields = ('order', 'kind', 'created_at', 'sent_at', 'last_error')
+    actions = ['retry_now']
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=OutboxEmail.SENT).update(
+            status=OutboxEmail.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} emails queued for retry.")
+
+
+@admin.register(OrderDigest)
+class OrderDigestAdmin(admin.ModelAdmin):
+    list_display = ('id', 'sent_at', 'order_count', 'last_order_id')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product_size', 'quantity', 'cart_item', 'expires_at')
+    list_select_related = ('product_size__product', 'cart_item__product')
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """
+    Sales dashboard: charts the DailySales rollup (kept current by
+    refresh_sales_rollup) above the usual row listing.
+    """
+    change_list_template = "admin/orders/dailysales/change_list.html"
+    list_display = ('date', 'product', 'size', 'units', 'revenue', 'orders')
+    list_select_related = ('product',)
+    date_hierarchy = 'date'
+    ordering = ('-date', '-revenue')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    DASHBOARD_DAYS = (7, 30, 90, 365)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get("days", 30))
+        except ValueError:
+            days = 30
+        if days not in self.DASHBOARD_DAYS:
+            days = 30
+
+        # Only `days` × products-sold rows are read
+        recent = DailySales.objects.filter(date__gt=timezone.localdate() - timedelta(days=days))
+        daily = list(
+            recent.values("date")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("date")
+        )
+        top_products = list(
+            recent.values("product__name")
+            .annotate(units=Sum("units"), revenue=Sum("revenue"))
+            .order_by("-revenue")[:10]
+        )
+
+        # The period selector is not a changelist filter
+        request.GET = request.GET.copy()
+        request.GET.pop("days", None)
+
+        return super().changelist_view(request, {
+            "dashboard_days": days,
+            "dashboard_day_options": self.DASHBOARD_DAYS,
+            "dashboard_chart": {
+                "labels": [row["date"].isoformat() for row in daily],
+                "revenue": [float(row["revenue"]) for row in daily],
+                "units": [row["units"] for row in daily],
+            },
+            "dashboard_revenue": sum(row["revenue"] for row in daily),
+            "dashboard_units": sum(row["units"] for row in daily),
+            "top_products": top_products,
+            **(extra_context or {}),
+        })
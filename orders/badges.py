@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db.models import Sum
+
+from products.models import WishlistItem
+from .models import CartItem
+
+
+# Writes outside the views (admin edits, expired holds, imports) do not
+# adjust the badges; a short timeout bounds how long a count can drift
+BADGE_TIMEOUT = 60 * 5
+BADGE_KINDS = ("cart", "wishlist")
+
+
+def _key(kind, user_id):
+    return f"badge:{kind}:{user_id}"
+
+
+def _count(kind, user_id):
+    if kind == "cart":
+        return CartItem.objects.filter(cart__user_id=user_id).aggregate(
+            n=Sum("quantity")
+        )["n"] or 0
+    return WishlistItem.objects.filter(wishlist__user_id=user_id).count()
+
+
+def badge_counts(user_id):
+    """
+    Returns {"cart": units in cart, "wishlist": items in wishlist}.
+    Served from the cache, which is kept off the database (products.E002),
+    so a warm read costs no query; only a cold cache costs one per badge.
+    """
+    keys = {kind: _key(kind, user_id) for kind in BADGE_KINDS}
+    cached = cache.get_many(keys.values())
+
+    counts = {}
+    missing = {}
+    for kind, key in keys.items():
+        if key in cached:
+            counts[kind] = cached[key]
+        else:
+            counts[kind] = missing[key] = _count(kind, user_id)
+
+    if missing:
+        cache.set_many(missing, BADGE_TIMEOUT)
+    return counts
+
+
+def adjust_badge(user_id, kind, delta):
+    """
+    Applies a change to a cached badge count in place.
+    If the count is not cached it is simply computed on the next read.
+    incr is atomic on Redis (and within a locmem process), so concurrent
+    changes are never lost; the database cache's read-then-write incr is
+    rejected by check --deploy.
+    """
+    if not delta:
+        return
+    try:
+        cache.incr(_key(kind, user_id), delta)
+    except ValueError:
+        pass
+
+
+def reset_badge(user_id, kind, value=0):
+    cache.set(_key(kind, user_id), value, BADGE_TIMEOUT)
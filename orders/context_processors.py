@@ -0,0 +1,11 @@
+from .badges import badge_counts
+
+
+def badges(request):
+    """
+    Exposes cart and wishlist badge counts to every template.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"badge_counts": badge_counts(user.pk)}
@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+
+def _item_lines(items):
+    return "\n".join([
+        f"- {i.product.name} | Qty: {i.quantity}" +
+        (f" | Size: {i.size}" if i.size else "")
+        for i in items
+    ])
+
+
+# ==================================================
+# ADMIN EMAIL (HTML)
+# ==================================================
+
+def build_admin_order_email(order):
+    """
+    Builds the HTML email notification to admin for a new order.
+    Returns None when no admin recipients are configured.
+    """
+    if not settings.ADMIN_NOTIFICATION_EMAILS:
+        return None
+
+    items = order.items.all()
+
+    subject = f"New Order Placed - Order #{order.id}"
+
+    text_body = (
+        f"New order placed.\n\n"
+        f"Order ID: {order.id}\n"
+        f"Customer: {order.full_name}\n"
+        f"Email: {order.user.email}\n"
+        f"Phone: {order.phone}\n"
+        f"Address: {order.address}\n\n"
+        f"Items:\n" + _item_lines(items)
+    )
+
+    html_body = render_to_string("emails/admin_new_order.html", {
+        "order": order,
+        "items": items,
+        "now": order.created_at,
+    })
+
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_body,
+        from_email=None,  # Uses DEFAULT_FROM_EMAIL
+        to=settings.ADMIN_NOTIFICATION_EMAILS,
+    )
+    msg.attach_alternative(html_body, "text/html")
+    return msg
+
+
+# ==================================================
+# CUSTOMER CONFIRMATION EMAIL
+# ==================================================
+
+def build_customer_order_email(order):
+    """
+    Builds the order confirmation email to the customer.
+    Returns None when the customer has no email address.
+    """
+    customer_email = (order.user.email or "").strip()
+    if not customer_email:
+        return None
+
+    items = order.items.all()
+    placed_on = timezone.localtime(order.created_at)
+
+    subject = f"Order Confirmed ✅ A&M Signature - Order #{order.id}"
+
+    text_body = (
+        f"Hi {order.full_name},\n\n"
+        f"Thank you for your order! Your order has been received.\n\n"
+        f"Order ID: {order.id}\n"
+        f"Placed on: {placed_on.strftime('%d %b %Y, %H:%M')}\n\n"
+        f"Delivery Address:\n{order.address}\n\n"
+        f"Items:\n" + _item_lines(items) +
+        "\n\nWe’ll contact you when it’s out for delivery.\n"
+        "A&M Signature — Wear Your Story"
+    )
+
+    html_body = render_to_string("emails/customer_order_confirmation.html", {
+        "order": order,
+        "items": items,
+        "now": order.created_at,
+        "brand_name": "A&M Signature",
+        "support_email": settings.DEFAULT_FROM_EMAIL,
+    })
+
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_body,
+        from_email=None,
+        to=[customer_email],
+    )
+    msg.attach_alternative(html_body, "text/html")
+    return msg
+
+
+# ==================================================
+# ADMIN ORDER DIGEST
+# ==================================================
+
+def build_order_digest_email(orders):
+    """
+    Builds one admin summary email for several orders. Each order needs
+    its items (with products) prefetched.
+    Returns None when no admin recipients are configured.
+    """
+    if not settings.ADMIN_NOTIFICATION_EMAILS:
+        return None
+
+    grand_total = sum(order.subtotal or 0 for order in orders)
+
+    subject = f"{len(orders)} New Orders - #{orders[0].id} to #{orders[-1].id}"
+
+    text_body = f"{len(orders)} new orders, €{grand_total:.2f} in total.\n" + "".join([
+        f"\nOrder #{order.id} | {order.full_name} | {order.phone} | €{order.subtotal or 0:.2f}\n"
+        + _item_lines(order.items.all()) + "\n"
+        for order in orders
+    ])
+
+    html_body = render_to_string("emails/admin_order_digest.html", {
+        "orders": orders,
+        "grand_total": grand_total,
+        "now": timezone.now(),
+    })
+
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_body,
+        from_email=None,
+        to=settings.ADMIN_NOTIFICATION_EMAILS,
+    )
+    msg.attach_alternative(html_body, "text/html")
+    return msg
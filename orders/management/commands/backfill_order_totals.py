@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from orders.models import MONEY, Order, OrderItem
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills in OrderItem.unit_price and Order.subtotal/item_count on orders "
+        "placed before they were recorded at checkout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of rows updated per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        # The price at the time is lost: the current price is the best guess
+        items = self.backfill(
+            OrderItem.objects.filter(unit_price__isnull=True),
+            batch_size,
+            unit_price=Subquery(
+                Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1]
+            ),
+        )
+
+        lines = OrderItem.objects.filter(order_id=OuterRef("pk")).values("order_id")
+        orders = self.backfill(
+            Order.objects.filter(subtotal__isnull=True),
+            batch_size,
+            subtotal=Coalesce(
+                Subquery(lines.annotate(
+                    total=Sum(F("quantity") * F("unit_price"), output_field=MONEY)
+                ).values("total")),
+                0,
+                output_field=MONEY,
+            ),
+            item_count=Coalesce(
+                Subquery(lines.annotate(n=Sum("quantity")).values("n")),
+                0,
+            ),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {items} order items and {orders} orders."
+        ))
+
+    def backfill(self, queryset, batch_size, **values):
+        """
+        Updates the rows of queryset in id-ordered batches, one short
+        transaction each, until none are left.
+        """
+        done = 0
+        last_id = 0
+        while True:
+            ids = list(
+                queryset.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return done
+            with transaction.atomic():
+                done += queryset.model.objects.filter(id__in=ids).update(**values)
+            last_id = ids[-1]
@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from orders.models import Cart, CartItem
+from products.models import Product, ProductSize
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent checkout throughput on a single size, "
+        "first without and then with stock shards. Run against PostgreSQL: "
+        "SQLite serializes all writers, so sharding cannot help there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=8, help="Concurrent buyers (threads).")
+        parser.add_argument("--orders", type=int, default=25, help="Orders placed per buyer.")
+        parser.add_argument("--shards", type=int, default=8, help="Shard count for the sharded run.")
+
+    def handle(self, *args, **options):
+        host = next(
+            (h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"),
+            "localhost",
+        )
+
+        for shards in (0, options["shards"]):
+            placed, failed, elapsed = self.run(host, shards, options["buyers"], options["orders"])
+            label = f"{shards} shards" if shards else "unsharded"
+            self.stdout.write(
+                f"{label:>12}: {placed / elapsed:8.1f} orders/sec "
+                f"({placed} placed, {failed} failed, {elapsed:.2f}s)"
+            )
+
+    def run(self, host, shards, buyers, orders):
+        tag = uuid.uuid4().hex[:8]
+        product = Product.objects.create(
+            name=f"Checkout benchmark {tag}",
+            description="-",
+            price=1,
+            has_sizes=True,
+            available=False,
+        )
+        ProductSize.objects.create(product=product, size="M", stock=buyers * orders, shards=shards)
+        users = User.objects.bulk_create([
+            User(username=f"checkout-bench-{tag}-{n}") for n in range(buyers)
+        ])
+        carts = {
+            cart.user_id: cart
+            for cart in Cart.objects.bulk_create([Cart(user=user) for user in users])
+        }
+
+        url = reverse("orders:place_order")
+        success_url = reverse("orders:order_success")
+        start = threading.Barrier(buyers + 1)
+        results = []
+        lock = threading.Lock()
+
+        def buyer(user):
+            client = Client(HTTP_HOST=host, raise_request_exception=False)
+            client.force_login(user)
+            placed = failed = 0
+            try:
+                start.wait()
+                for _ in range(orders):
+                    CartItem.objects.create(cart=carts[user.id], product=product, size="M", quantity=1)
+                    response = client.post(url, {
+                        "full_name": "Benchmark", "phone": "0", "address": "-",
+                    })
+                    if response.status_code == 302 and response["Location"] == success_url:
+                        placed += 1
+                    else:
+                        failed += 1
+                        CartItem.objects.filter(cart=carts[user.id]).delete()
+            finally:
+                connection.close()
+                with lock:
+                    results.append((placed, failed))
+
+        threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        # Users cascade to their carts and orders
+        User.objects.filter(id__in=[user.id for user in users]).delete()
+        product.delete()
+
+        return sum(p for p, _ in results), sum(f for _, f in results), elapsed
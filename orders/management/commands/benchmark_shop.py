@@ -0,0 +1,273 @@
+import http.cookiejar
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from orders.models import CartItem
+from products.models import Product, ProductSize
+from .seed_shop import DEFAULT_PASSWORD, DEFAULT_PREFIX
+
+
+ENDPOINTS = ("browse", "product_detail", "add_to_cart", "update_quantity", "place_order")
+
+
+class ClientSession:
+    """
+    Requests through the Django test client, in process. Counts the SQL
+    queries each request runs on this thread's connection.
+    """
+
+    def __init__(self, host, user):
+        self.client = Client(HTTP_HOST=host, raise_request_exception=False)
+        self.client.force_login(user)
+        self.queries = 0
+
+    def _count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def request(self, method, path, data=None, headers=None):
+        """
+        Returns (status, Location header or None, SQL queries run).
+        """
+        self.queries = 0
+        with connection.execute_wrapper(self._count):
+            if method == "POST":
+                response = self.client.post(path, data or {}, headers=headers)
+            else:
+                response = self.client.get(path, headers=headers)
+        return response.status_code, response.get("Location"), self.queries
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """
+    Requests over HTTP to a running server, logged in with a password.
+    Queries are not visible from here.
+    """
+
+    def __init__(self, base_url, user, password):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+        self.request("GET", reverse("login"))  # sets the CSRF cookie
+        status, location, _ = self.request("POST", reverse("login"), {
+            "username": user.username, "password": password,
+        })
+        if status != 302:
+            raise CommandError(f"Could not log in as {user.username} at {self.base_url}.")
+
+    def _csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == settings.CSRF_COOKIE_NAME), "")
+
+    def request(self, method, path, data=None, headers=None):
+        body = None
+        headers = dict(headers or {})
+        if method == "POST":
+            body = urllib.parse.urlencode({**(data or {}), "csrfmiddlewaretoken": self._csrf_token()}).encode()
+            headers["Referer"] = self.base_url + path
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status, response.headers.get("Location"), None
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get("Location"), None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the shop's real URL routes with concurrent workers, each "
+        "logged in as a seeded user (run seed_shop first): browse, product "
+        "detail, add to cart, AJAX quantity update and place order. Prints "
+        "per-endpoint latency percentiles, requests/sec and queries per "
+        "request as JSON. Run against PostgreSQL: SQLite lets one writer in "
+        "at a time and concurrent carts fail with 'database is locked'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent workers (threads).")
+        parser.add_argument("--iterations", type=int, default=20, help="Shopping rounds per worker.")
+        parser.add_argument(
+            "--checkout-every", type=int, default=5,
+            help="Place an order every this many rounds.",
+        )
+        parser.add_argument(
+            "--base-url",
+            help="Drive a running server (e.g. http://127.0.0.1:8000) instead of the "
+                 "in-process test client. It must use this settings module's database.",
+        )
+        parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Username prefix used by seed_shop.")
+        parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password of the seeded users.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed of the workers' choices.")
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-")
+            .order_by("id")[:options["workers"]]
+        )
+        if len(users) < options["workers"]:
+            raise CommandError(
+                f"Need {options['workers']} users named {options['prefix']}-<n>; run seed_shop first."
+            )
+
+        stock = list(
+            ProductSize.objects.filter(product__available=True, stock__gt=0)
+            .values_list("product_id", "size")
+        )
+        stock += [
+            (product_id, None)
+            for product_id in Product.objects.filter(available=True, has_sizes=False).values_list("id", flat=True)
+        ]
+        if not stock:
+            raise CommandError("No product is in stock; run seed_shop first.")
+
+        if options["base_url"]:
+            mode = "http"
+            sessions = [HttpSession(options["base_url"], user, options["password"]) for user in users]
+        else:
+            mode = "client"
+            host = next(
+                (h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"),
+                "localhost",
+            )
+            sessions = None
+
+        samples = {endpoint: [] for endpoint in ENDPOINTS}
+        lock = threading.Lock()
+        start = threading.Barrier(len(users) + 1)
+
+        def worker(n, user):
+            rng = random.Random(options["seed"] * 1000 + n)
+            try:
+                try:
+                    session = sessions[n] if sessions else ClientSession(host, user)
+                except Exception:
+                    start.abort()
+                    raise
+                mine = {endpoint: [] for endpoint in ENDPOINTS}
+                start.wait()
+                for round_ in range(1, options["iterations"] + 1):
+                    self.shop(session, user, rng, stock, mine, checkout=round_ % options["checkout_every"] == 0)
+                with lock:
+                    for endpoint, results in mine.items():
+                        samples[endpoint].extend(results)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n, user)) for n, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        try:
+            start.wait()
+        except threading.BrokenBarrierError:
+            for thread in threads:
+                thread.join()
+            raise CommandError("A worker failed to start.")
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        report = {
+            "mode": mode,
+            "workers": options["workers"],
+            "iterations": options["iterations"],
+            "elapsed_s": round(elapsed, 3),
+            "requests": sum(len(results) for results in samples.values()),
+            "requests_per_sec": round(sum(len(results) for results in samples.values()) / elapsed, 1),
+            "endpoints": {endpoint: summarize(results, elapsed) for endpoint, results in samples.items()},
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def shop(self, session, user, rng, stock, results, checkout):
+        """
+        One shopping round: browse, open a product, add it to the cart,
+        raise its quantity and, on checkout rounds, place the order.
+        Each result is (seconds, ok, queries).
+        """
+        def timed(endpoint, method, path, data=None, headers=None, ok=lambda status, location: status < 400):
+            began = time.perf_counter()
+            status, location, queries = session.request(method, path, data, headers)
+            results[endpoint].append((time.perf_counter() - began, ok(status, location), queries))
+
+        product_id, size = rng.choice(stock)
+        timed("browse", "GET", reverse("products:product_list"))
+        timed("product_detail", "GET", reverse("products:product_detail", args=[product_id]))
+        timed(
+            "add_to_cart", "POST", reverse("orders:add_to_cart", args=[product_id]),
+            {"size": size} if size else {},
+        )
+
+        item_id = (
+            CartItem.objects.filter(cart__user=user, product_id=product_id, size=size)
+            .values_list("id", flat=True).first()
+        )
+        if item_id:
+            timed(
+                "update_quantity", "POST", reverse("orders:update_cart_item", args=[item_id]),
+                {"action": "increase"}, {"X-Requested-With": "XMLHttpRequest"},
+            )
+
+        if checkout:
+            success_url = reverse("orders:order_success")
+            timed(
+                "place_order", "POST", reverse("orders:place_order"),
+                {
+                    "full_name": user.username, "phone": "0000000000",
+                    "address": "Benchmark street 1", "checkout_token": str(uuid.uuid4()),
+                },
+                ok=lambda status, location: status == 302 and (location or "").endswith(success_url),
+            )
+
+
+def summarize(results, elapsed):
+    """
+    Latency percentiles (ms), throughput and mean queries of one endpoint.
+    """
+    if not results:
+        return {"requests": 0}
+
+    latencies = sorted(seconds * 1000 for seconds, _, _ in results)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    queries = [q for _, _, q in results if q is not None]
+
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "requests_per_sec": round(len(results) / elapsed, 1),
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+        "queries_per_request": round(statistics.mean(queries), 1) if queries else None,
+    }
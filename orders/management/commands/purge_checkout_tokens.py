@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import CheckoutToken
+
+
+class Command(BaseCommand):
+    help = "Deletes checkout idempotency tokens older than CHECKOUT_TOKEN_HOURS."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.CHECKOUT_TOKEN_HOURS)
+        deleted, _ = CheckoutToken.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} checkout tokens."))
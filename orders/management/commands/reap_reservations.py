@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = "Deletes expired stock reservations in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and reap holds as they expire.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=60,
+            help="Seconds to sleep between runs in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Expired holds already stop counting against stock;
+            # this only keeps the table small
+            deleted, _ = StockReservation.objects.expired().delete()
+            if deleted:
+                self.stdout.write(self.style.SUCCESS(f"Reaped {deleted} expired reservations."))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
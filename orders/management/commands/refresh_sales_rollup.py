@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.rollup import BATCH_SIZE, refresh_sales_rollup
+
+
+class Command(BaseCommand):
+    help = "Folds orders placed since the last run into the daily sales rollup."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and roll up new orders as they arrive.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=300,
+            help="Seconds to sleep between runs in --loop mode.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=BATCH_SIZE,
+            help="Orders folded in per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = 0
+            while True:
+                batch = refresh_sales_rollup(options["batch_size"])
+                processed += batch
+                if batch < options["batch_size"]:
+                    break
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} orders."))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
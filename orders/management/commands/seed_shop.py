@@ -0,0 +1,189 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Cart, CartItem, Order, OrderItem
+from products import search
+from products.cache import bump_catalog_version
+from products.models import SIZE_ORDER, Product, ProductSize, Wishlist, WishlistItem
+from products.stock import refresh_stock_summary
+
+
+DEFAULT_PREFIX = "seed"
+DEFAULT_PASSWORD = "seed-password"
+
+# Users are written in chunks of this many, one transaction each
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generates users, products, sizes, carts, wishlists and orders "
+        "for load testing. The same options and --seed always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100, help="Users to create.")
+        parser.add_argument("--products", type=int, default=200, help="Products to create.")
+        parser.add_argument(
+            "--sized-share", type=float, default=0.7,
+            help="Share of products that come in sizes (the rest are sarees).",
+        )
+        parser.add_argument("--cart-lines", type=int, default=5, help="Most lines per user cart.")
+        parser.add_argument("--wishlist-items", type=int, default=10, help="Most items per wishlist.")
+        parser.add_argument("--orders", type=int, default=3, help="Most past orders per user.")
+        parser.add_argument("--days", type=int, default=90, help="Past orders are spread over this many days.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+        parser.add_argument(
+            "--prefix", default=DEFAULT_PREFIX,
+            help="Usernames are <prefix>-<n>; products are tagged with it too.",
+        )
+        parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password of every seeded user.")
+        parser.add_argument(
+            "--flush", action="store_true",
+            help="Delete data seeded earlier with the same prefix first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["products"] < 1:
+            raise CommandError("--products must be at least 1.")
+
+        prefix = options["prefix"]
+        tag = f"Seed data ({prefix})."
+
+        if options["flush"]:
+            # Carts, wishlists and orders cascade from the users
+            deleted, _ = User.objects.filter(username__startswith=f"{prefix}-").delete()
+            deleted += Product.objects.filter(description=tag).delete()[0]
+            self.stdout.write(f"Deleted {deleted} rows seeded earlier.")
+        elif User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Users with prefix {prefix!r} exist; use --flush or another --prefix.")
+
+        rng = random.Random(options["seed"])
+        now = timezone.now()
+
+        products, stock = self.seed_products(rng, options["products"], options["sized_share"], tag)
+
+        password = make_password(options["password"])  # hashed once for every user
+        totals = {"users": 0, "cart lines": 0, "wishlist items": 0, "orders": 0}
+        for start in range(0, options["users"], CHUNK_SIZE):
+            count = min(CHUNK_SIZE, options["users"] - start)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f"{prefix}-{n}", email=f"{prefix}-{n}@example.com", password=password)
+                    for n in range(start, start + count)
+                ])
+                totals["users"] += len(users)
+                totals["cart lines"] += self.seed_carts(rng, users, stock, options["cart_lines"])
+                totals["wishlist items"] += self.seed_wishlists(rng, users, products, options["wishlist_items"])
+                totals["orders"] += self.seed_orders(rng, users, stock, options["orders"], options["days"], now)
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(products)} products, "
+            + ", ".join(f"{n} {label}" for label, n in totals.items())
+            + f". Users log in as {prefix}-<n> with the given password."
+        ))
+
+    def seed_products(self, rng, count, sized_share, tag):
+        """
+        Creates the products and their sizes. Returns the products and the
+        (product, size) pairs that can be bought (size None for sarees).
+        """
+        products = []
+        for n in range(count):
+            sized = rng.random() < sized_share
+            products.append(Product(
+                name=f"{'Kurti' if sized else 'Saree'} {n}",
+                description=tag,
+                price=Decimal(rng.randrange(900, 15000)) / 100,
+                has_sizes=sized,
+            ))
+        products = Product.objects.bulk_create(products, batch_size=CHUNK_SIZE)
+
+        sizes = []
+        for product in products:
+            if product.has_sizes:
+                for size in rng.sample(list(SIZE_ORDER), rng.randint(2, len(SIZE_ORDER))):
+                    sizes.append(ProductSize(
+                        product=product, size=size, stock=rng.choice([0, 5, 20, 50, 200]),
+                        order=SIZE_ORDER[size],
+                    ))
+        ProductSize.objects.bulk_create(sizes, batch_size=CHUNK_SIZE)
+
+        for start in range(0, len(products), CHUNK_SIZE):
+            product_ids = [product.id for product in products[start:start + CHUNK_SIZE]]
+            refresh_stock_summary(product_ids)
+            search.index_products(product_ids)
+
+        by_id = {product.id: product for product in products}
+        stock = [(by_id[ps.product_id], ps.size) for ps in sizes if ps.stock > 0]
+        stock += [(product, None) for product in products if not product.has_sizes]
+        return products, stock
+
+    def seed_carts(self, rng, users, stock, max_lines):
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        lines = []
+        for cart in carts:
+            for product, size in self._pick(rng, stock, max_lines):
+                lines.append(CartItem(cart=cart, product=product, size=size, quantity=rng.randint(1, 3)))
+        CartItem.objects.bulk_create(lines, batch_size=CHUNK_SIZE)
+        return len(lines)
+
+    def seed_wishlists(self, rng, users, products, max_items):
+        wishlists = Wishlist.objects.bulk_create([Wishlist(user=user) for user in users])
+        items = [
+            WishlistItem(wishlist=wishlist, product=product)
+            for wishlist in wishlists
+            for product in rng.sample(products, rng.randint(0, min(max_items, len(products))))
+        ]
+        WishlistItem.objects.bulk_create(items, batch_size=CHUNK_SIZE)
+        return len(items)
+
+    def seed_orders(self, rng, users, stock, max_orders, days, now):
+        orders, placed_at, lines = [], [], []
+        for user in users:
+            for _ in range(rng.randint(0, max_orders)):
+                order = Order(
+                    user=user,
+                    full_name=user.username,
+                    phone="0000000000",
+                    address="Seed street 1",
+                    is_delivered=rng.random() < 0.6,
+                )
+                items = [
+                    OrderItem(product=product, size=size, quantity=rng.randint(1, 3), unit_price=product.price)
+                    for product, size in self._pick(rng, stock, 4, at_least=1)
+                ]
+                order.subtotal = sum(item.unit_price * item.quantity for item in items)
+                order.item_count = sum(item.quantity for item in items)
+                orders.append(order)
+                placed_at.append(now - timedelta(seconds=rng.randrange(days * 24 * 3600)))
+                lines.append(items)
+
+        orders = Order.objects.bulk_create(orders, batch_size=CHUNK_SIZE)
+        # auto_now_add stamps every order with now; spread them over the past days
+        for order, created_at in zip(orders, placed_at):
+            order.created_at = created_at
+        Order.objects.bulk_update(orders, ["created_at"], batch_size=CHUNK_SIZE)
+
+        for order, items in zip(orders, lines):
+            for item in items:
+                item.order = order
+        OrderItem.objects.bulk_create([item for items in lines for item in items], batch_size=CHUNK_SIZE)
+        return len(orders)
+
+    def _pick(self, rng, stock, most, at_least=0):
+        """
+        Up to `most` distinct purchasable (product, size) pairs, one per product.
+        """
+        picked = {}
+        for product, size in rng.sample(stock, min(len(stock), rng.randint(at_least, most))):
+            picked.setdefault(product.id, (product, size))
+        return list(picked.values())
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.digest import digest_enabled, send_order_digest
+
+
+class Command(BaseCommand):
+    help = "Sends the admin summary email of orders placed since the last digest."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and send a digest every ADMIN_ORDER_DIGEST_MINUTES.",
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Send now even if the digest window has not passed.",
+        )
+
+    def handle(self, *args, **options):
+        if not digest_enabled() and not options["force"]:
+            raise CommandError(
+                "ADMIN_ORDER_DIGEST_MINUTES is 0: admin emails are sent per order."
+            )
+
+        while True:
+            try:
+                sent = send_order_digest(force=options["force"])
+            except Exception as e:
+                self.stderr.write(f"Order digest failed, will retry: {e}")
+            else:
+                if sent:
+                    self.stdout.write(self.style.SUCCESS(f"Sent digest of {sent} orders."))
+
+            if not options["loop"]:
+                break
+            # Poll well inside the window so digests go out close to on time
+            time.sleep(max(60, settings.ADMIN_ORDER_DIGEST_MINUTES * 60 // 4))
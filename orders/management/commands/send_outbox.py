@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import BATCH_SIZE, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends queued order emails from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and send new emails as they are queued.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=10,
+            help="Seconds to sleep between polls in --loop mode.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=BATCH_SIZE,
+            help="Emails sent per mail connection.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Drain everything that is due before sleeping
+            while True:
+                sent, failed = drain_outbox(options["batch_size"])
+                if sent:
+                    self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails."))
+                if failed:
+                    self.stderr.write(f"{failed} emails failed, will retry with backoff.")
+                if sent + failed < options["batch_size"]:
+                    break
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
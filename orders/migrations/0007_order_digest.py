@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.PositiveIntegerField()),
+                ('order_count', models.PositiveIntegerField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_digest'),
+        ('products', '0012_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('cart_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='orders.cartitem')),
+                ('product_size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.productsize')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product_size', 'expires_at'], name='reservation_active_idx')],
+            },
+        ),
+    ]
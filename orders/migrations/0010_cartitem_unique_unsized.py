@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_unsized_lines(apps, schema_editor):
+    CartItem = apps.get_model("orders", "CartItem")
+    duplicates = (
+        CartItem.objects.filter(size__isnull=True)
+        .values("cart_id", "product_id")
+        .annotate(n=Count("id"), keep=Min("id"), quantity=Sum("quantity"))
+        .filter(n__gt=1)
+    )
+    for row in duplicates:
+        lines = CartItem.objects.filter(
+            cart_id=row["cart_id"], product_id=row["product_id"], size__isnull=True
+        )
+        lines.exclude(id=row["keep"]).delete()
+        lines.filter(id=row["keep"]).update(quantity=row["quantity"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_checkout_token'),
+        ('products', '0013_stock_shards'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_unsized_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('size__isnull', True)), fields=('cart', 'product'), name='cartitem_unique_unsized'),
+        ),
+    ]
@@ -1,16 +1,281 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from products.models import Product
+from django.utils import timezone
+from products.models import Product, ProductSize
+
+
+MONEY = models.DecimalField(max_digits=12, decimal_places=2)
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
         return f"Cart - {self.user.username}"
 
+    def summary(self, with_items=True):
+        """
+        Cart summary from a single query.
+
+        with_items=True loads every line with its line_total annotated and
+        sums them; with_items=False only runs the aggregate (for AJAX
+        responses that just need the totals).
+        Returns {"items": [...], "item_count": int, "total": Decimal}.
+        """
+        if not with_items:
+            return {"items": None, **self.items.totals()}
+
+        items = list(self.items.with_line_totals().order_by("id"))
+        return {
+            "items": items,
+            "item_count": sum(item.quantity for item in items),
+            "total": sum((item.line_total for item in items), Decimal("0.00")),
+        }
+
     def total_price(self):
-        return sum(item.total_price() for item in self.items.all())
+        return self.items.totals()["total"]
+
+
+class CartItemQuerySet(models.QuerySet):
+
+    def with_line_totals(self):
+        """
+        Lines with their product and quantity * price computed by the database.
+        """
+        return self.select_related("product").annotate(
+            line_total=ExpressionWrapper(F("quantity") * F("product__price"), output_field=MONEY)
+        )
+
+    def increment(self, cart_id, product, size=None):
+        """
+        Adds one unit of (product, size) to the cart without a
+        read-modify-write: an existing line is bumped with a single
+        UPDATE ... SET quantity = quantity + 1.
+
+        Sized products go through _increment_reserved, which also holds
+        the units against the size's stock.
+
+        Returns True if the unit was added, False if stock ran out.
+        """
+        if product.has_sizes:
+            return self._increment_reserved(cart_id, product, size)
+
+        line = self.filter(cart_id=cart_id, product=product, size=size)
+
+        for _ in range(2):
+            if line.update(quantity=F("quantity") + 1):
+                return True
+
+            try:
+                with transaction.atomic():
+                    self.create(cart_id=cart_id, product=product, size=size, quantity=1)
+                return True
+            except IntegrityError:
+                # A concurrent request created the line first: bump it instead
+                continue
+
+        return False
+
+    def _increment_reserved(self, cart_id, product, size):
+        """
+        Locks the ProductSize row, so adds of one size queue here instead
+        of at checkout, and only adds the unit while it fits into the
+        stock minus other carts' active holds. The line's hold is then
+        set to its new quantity with a fresh expiry.
+
+        Sharded sizes are never locked and take no holds: the line is
+        only kept within the size's last synced stock, and the shard
+        decrement at checkout is the real stock check.
+        """
+        with transaction.atomic():
+            ps = (
+                ProductSize.objects.filter(product=product, size=size)
+                .order_by("id")
+                .only("id", "stock", "shards")
+                .first()
+            )
+            if ps is None:
+                return False
+
+            if ps.shards:
+                line = self.filter(cart_id=cart_id, product=product, size=size)
+                if line.filter(quantity__lt=ps.stock).update(quantity=F("quantity") + 1):
+                    return True
+                if ps.stock < 1 or line.exists():
+                    return False
+                try:
+                    with transaction.atomic():
+                        self.create(cart_id=cart_id, product=product, size=size, quantity=1)
+                except IntegrityError:
+                    return False
+                return True
+
+            ps = ProductSize.objects.select_for_update().get(pk=ps.pk)
+            available = ps.stock - StockReservation.objects.held_units(ps.id, exclude_cart_id=cart_id)
+            line = self.filter(cart_id=cart_id, product=product, size=size)
+
+            for _ in range(2):
+                if line.filter(quantity__lt=available).update(quantity=F("quantity") + 1):
+                    break
+                if available < 1 or line.exists():
+                    return False
+                try:
+                    with transaction.atomic():
+                        self.create(cart_id=cart_id, product=product, size=size, quantity=1)
+                    break
+                except IntegrityError:
+                    # Only without row locks (SQLite): the line was just created
+                    continue
+            else:
+                return False
+
+            item_id, quantity = line.values_list("id", "quantity").get()
+            StockReservation.objects.hold(item_id, ps.id, quantity)
+        return True
+
+    def add_units(self, cart_id, lines):
+        """
+        Adds one unit of each (product, size) in lines to the cart with a
+        fixed number of queries, however many lines there are: one read
+        of the affected ProductSize rows, one locking read of the
+        unsharded ones (in id order), one grouped sum of other carts'
+        holds, one read of the cart's lines, then one UPDATE, one bulk
+        INSERT and one bulk hold upsert.
+
+        A sized line is only added while it fits into the size's stock
+        minus other carts' active holds, as in increment(). Sharded sizes
+        are neither locked nor held, as in increment().
+
+        Returns the set of (product_id, size) keys that were added.
+        """
+        wanted = {(product.id, size or None): product for product, size in lines}
+        if not wanted:
+            return set()
+
+        with transaction.atomic():
+            sized = {key for key, product in wanted.items() if product.has_sizes}
+            sizes = {}
+            if sized:
+                for ps in (
+                    ProductSize.objects.filter(
+                        product_id__in={product_id for product_id, _ in sized},
+                        size__in={size for _, size in sized},
+                    )
+                    .order_by("id")
+                ):
+                    sizes.setdefault((ps.product_id, ps.size), ps)
+            unsharded = [ps.id for ps in sizes.values() if not ps.shards]
+            if unsharded:
+                # Re-read under lock: the stock may have moved meanwhile
+                locked = {
+                    ps.id: ps
+                    for ps in ProductSize.objects.select_for_update().filter(id__in=unsharded).order_by("id")
+                }
+                sizes = {key: locked.get(ps.id, ps) for key, ps in sizes.items()}
+
+            held = dict(
+                StockReservation.objects.active()
+                .filter(product_size_id__in=unsharded)
+                .exclude(cart_item__cart_id=cart_id)
+                .values("product_size_id")
+                .annotate(units=Sum("quantity"))
+                .values_list("product_size_id", "units")
+            )
+
+            existing = {
+                (item.product_id, item.size or None): item
+                for item in self.filter(cart_id=cart_id, product_id__in={pid for pid, _ in wanted})
+            }
+
+            added, to_bump, to_create = set(), [], []
+            for key, product in wanted.items():
+                item = existing.get(key)
+                if key in sized:
+                    ps = sizes.get(key)
+                    quantity = item.quantity if item else 0
+                    if ps is None or quantity + 1 > ps.stock - held.get(ps.id, 0):
+                        continue
+                if item:
+                    item.quantity += 1
+                    to_bump.append(item)
+                else:
+                    item = self.model(cart_id=cart_id, product=product, size=key[1], quantity=1)
+                    to_create.append(item)
+                added.add(key)
+
+            if to_bump:
+                self.filter(id__in=[item.id for item in to_bump]).update(quantity=F("quantity") + 1)
+            try:
+                if to_create:
+                    with transaction.atomic():
+                        self.bulk_create(to_create)
+            except IntegrityError:
+                # Only without row locks (SQLite): a concurrent request created
+                # one of these lines first, so add them one at a time instead
+                for item in to_create:
+                    if not self.increment(cart_id, item.product, item.size):
+                        added.discard((item.product_id, item.size))
+                to_create = []
+
+            holds = [
+                StockReservation(
+                    cart_item_id=item.id,
+                    product_size=sizes[(item.product_id, item.size)],
+                    quantity=item.quantity,
+                    expires_at=reservation_expiry(),
+                )
+                for item in to_bump + to_create
+                if (item.product_id, item.size) in sized
+                and not sizes[(item.product_id, item.size)].shards
+            ]
+            StockReservation.objects.bulk_create(
+                holds,
+                update_conflicts=True,
+                unique_fields=["cart_item"],
+                update_fields=["product_size", "quantity", "expires_at"],
+            )
+        return added
+
+    def decrement(self, item_id):
+        """
+        Removes one unit from a line with a single conditional UPDATE,
+        deleting the line when its last unit goes.
+
+        Returns "decreased", "removed", or None if the line is gone.
+        """
+        for _ in range(2):
+            if self.filter(pk=item_id, quantity__gt=1).update(quantity=F("quantity") - 1):
+                # Release the unit from the line's hold as well
+                StockReservation.objects.filter(cart_item_id=item_id, quantity__gt=1).update(
+                    quantity=F("quantity") - 1
+                )
+                return "decreased"
+            if self.filter(pk=item_id, quantity__lte=1).delete()[0]:
+                return "removed"
+            if not self.filter(pk=item_id).exists():
+                return None
+            # Raced with an increment between the two statements: try again
+        return None
+
+    def totals(self):
+        """
+        Item count and grand total of these lines in one aggregate query.
+        """
+        return self.aggregate(
+            item_count=Coalesce(Sum("quantity"), 0),
+            total=Coalesce(
+                Sum(F("quantity") * F("product__price"), output_field=MONEY),
+                Decimal("0.00"),
+                output_field=MONEY,
+            ),
+        )
 
 
 class CartItem(models.Model):
@@ -19,12 +284,87 @@ class CartItem(models.Model):
     size = models.CharField(max_length=10,blank=True, null=True)
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemQuerySet.as_manager()
+
     class Meta:
         unique_together = ('cart', 'product', 'size' )
+        constraints = [
+            # NULL sizes never collide in unique_together; without this the
+            # insert-on-miss in increment() could create duplicate lines
+            models.UniqueConstraint(
+                fields=["cart", "product"],
+                condition=models.Q(size__isnull=True),
+                name="cartitem_unique_unsized",
+            ),
+        ]
 
     def total_price(self):
+        # Use the database-computed value when the line was loaded with it
+        if hasattr(self, "line_total"):
+            return self.line_total
         return self.product.price * self.quantity
     
+class StockReservationQuerySet(models.QuerySet):
+
+    def active(self):
+        return self.filter(expires_at__gt=timezone.now())
+
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+    def held_units(self, product_size_id, exclude_cart_id=None):
+        """
+        Units of a ProductSize held by active reservations,
+        optionally ignoring one cart's own holds.
+        """
+        holds = self.active().filter(product_size_id=product_size_id)
+        if exclude_cart_id is not None:
+            holds = holds.exclude(cart_item__cart_id=exclude_cart_id)
+        return holds.aggregate(units=Coalesce(Sum("quantity"), 0))["units"]
+
+    def hold(self, cart_item_id, product_size_id, quantity):
+        """
+        Creates or refreshes the hold of a cart line in one upsert.
+        """
+        self.bulk_create(
+            [StockReservation(
+                cart_item_id=cart_item_id,
+                product_size_id=product_size_id,
+                quantity=quantity,
+                expires_at=reservation_expiry(),
+            )],
+            update_conflicts=True,
+            unique_fields=["cart_item"],
+            update_fields=["product_size", "quantity", "expires_at"],
+        )
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_MINUTES)
+
+
+class StockReservation(models.Model):
+    """
+    Units of a ProductSize held for a cart line until expires_at.
+    Available stock is stock minus the active holds; checkout turns the
+    holds into the actual decrement and the lines' deletion removes them.
+    """
+    cart_item = models.OneToOneField(CartItem, related_name='reservation', on_delete=models.CASCADE)
+    product_size = models.ForeignKey(ProductSize, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = StockReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product_size", "expires_at"], name="reservation_active_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} × {self.product_size} until {self.expires_at:%H:%M}"
+
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     full_name = models.CharField(max_length=100)
@@ -32,6 +372,18 @@ class Order(models.Model):
     address = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_delivered = models.BooleanField(default=False)
+    # Snapshots taken at checkout (NULL on orders not yet backfilled,
+    # see the backfill_order_totals command)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    item_count = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Admin changelist: date hierarchy, delivered filter, per-customer history
+            models.Index(fields=["created_at"], name="order_created_idx"),
+            models.Index(fields=["is_delivered", "created_at"], name="order_delivered_idx"),
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
@@ -42,6 +394,111 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     size = models.CharField(max_length=10, blank=True, null=True)
     quantity = models.PositiveIntegerField()
+    # Product.price at checkout
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
 
     def __str__(self):
         return f"{self.product.name} ({self.size})"
+
+
+class CheckoutToken(models.Model):
+    """
+    Idempotency key of one checkout form. Committed together with the
+    order it produced, so a re-submitted form finds it and is redirected
+    instead of placing the order again. Purged after
+    CHECKOUT_TOKEN_HOURS by the purge_checkout_tokens command.
+    """
+    key = models.UUIDField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} -> Order #{self.order_id}"
+
+
+class OutboxEmail(models.Model):
+    """
+    An order email waiting to be sent. Rows are written in the same
+    transaction as the Order and drained by the send_outbox worker.
+    """
+    ADMIN_NEW_ORDER = "admin_new_order"
+    CUSTOMER_CONFIRMATION = "customer_confirmation"
+    KIND_CHOICES = [
+        (ADMIN_NEW_ORDER, "Admin new order"),
+        (CUSTOMER_CONFIRMATION, "Customer confirmation"),
+    ]
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    ]
+
+    order = models.ForeignKey(Order, related_name='emails', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for Order #{self.order_id} ({self.status})"
+
+
+class OrderDigest(models.Model):
+    """
+    One admin summary email. last_order_id is the watermark: the next
+    digest covers the orders placed after it.
+    """
+    last_order_id = models.PositiveIntegerField()
+    order_count = models.PositiveIntegerField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Digest of {self.order_count} orders up to #{self.last_order_id}"
+
+
+class DailySales(models.Model):
+    """
+    Sales of one product size on one day, rolled up from the orders by
+    the refresh_sales_rollup command. Products without sizes use size "".
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    size = models.CharField(max_length=10, blank=True, default="")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+        unique_together = ("date", "product", "size")
+        indexes = [
+            models.Index(fields=["date"], name="dailysales_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.size}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Highest Order id already folded into a rollup.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} up to Order #{self.last_order_id}"
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .digest import wants_order_alert
+from .emails import build_admin_order_email, build_customer_order_email
+from .models import OrderItem, OutboxEmail
+
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+
+# Retry after 1, 2, 4, ... minutes, capped at an hour
+BACKOFF_BASE = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=1)
+
+# How long a worker owns the rows it claimed before another may retry them
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+BUILDERS = {
+    OutboxEmail.ADMIN_NEW_ORDER: build_admin_order_email,
+    OutboxEmail.CUSTOMER_CONFIRMATION: build_customer_order_email,
+}
+
+
+def enqueue_order_emails(order):
+    """
+    Queues the customer email for a new order, and the admin email unless
+    the order is left to the admin digest.
+    Call inside the transaction that creates the order.
+    """
+    kinds = [OutboxEmail.CUSTOMER_CONFIRMATION]
+    if wants_order_alert(order.subtotal):
+        kinds.insert(0, OutboxEmail.ADMIN_NEW_ORDER)
+    OutboxEmail.objects.bulk_create([
+        OutboxEmail(order=order, kind=kind) for kind in kinds
+    ])
+
+
+def backoff(attempts):
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+def _claim(batch_size):
+    """
+    Takes up to batch_size due rows and pushes their next attempt past the
+    claim timeout, so concurrent workers skip them while they are sent.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(id__in=ids).update(next_attempt_at=now + CLAIM_TIMEOUT)
+
+    return list(
+        OutboxEmail.objects.filter(id__in=ids)
+        .select_related("order__user")
+        .prefetch_related(Prefetch(
+            "order__items",
+            queryset=OrderItem.objects.select_related("product"),
+        ))
+        .order_by("id")
+    )
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutboxEmail.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+
+
+def drain_outbox(batch_size=BATCH_SIZE):
+    """
+    Sends one batch of due outbox emails over a single mail connection.
+    Failed sends are retried with exponential backoff until MAX_ATTEMPTS.
+    Returns (sent, failed).
+    """
+    emails = _claim(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _failed(email, e)
+        failed = len(emails)
+    else:
+        try:
+            for email in emails:
+                try:
+                    message = BUILDERS[email.kind](email.order)
+                    if message is not None:
+                        message.connection = connection
+                        message.send(fail_silently=False)
+                except Exception as e:
+                    _failed(email, e)
+                    failed += 1
+                else:
+                    email.status = OutboxEmail.SENT
+                    email.sent_at = timezone.now()
+                    email.last_error = ""
+                    sent += 1
+        finally:
+            connection.close()
+
+    OutboxEmail.objects.bulk_update(
+        emails, ["status", "attempts", "next_attempt_at", "last_error", "sent_at"]
+    )
+    return sent, failed
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import MONEY, DailySales, Order, OrderItem, RollupWatermark
+
+
+WATERMARK = "daily_sales"
+BATCH_SIZE = 2000
+
+# Orders younger than this wait for the next run, so a checkout that
+# commits after a newer order cannot fall behind the watermark
+ROLLUP_GRACE = timedelta(minutes=1)
+
+
+def refresh_sales_rollup(batch_size=BATCH_SIZE):
+    """
+    Folds the next batch of orders after the watermark into DailySales
+    and moves the watermark, in one transaction. Returns the number of
+    orders processed (0 when caught up).
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.get_or_create(name=WATERMARK)
+        # Serializes concurrent runs
+        watermark = RollupWatermark.objects.select_for_update().get(pk=watermark.pk)
+
+        order_ids = list(
+            Order.objects.filter(
+                id__gt=watermark.last_order_id,
+                created_at__lt=timezone.now() - ROLLUP_GRACE,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+
+        sales = (
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .values(
+                "product_id",
+                day=TruncDate("order__created_at"),
+                line_size=Coalesce("size", Value("")),
+            )
+            .annotate(
+                units=Sum("quantity"),
+                # Orders placed before price snapshots fall back to today's price
+                revenue=Sum(
+                    F("quantity") * Coalesce("unit_price", "product__price"),
+                    output_field=MONEY,
+                ),
+                orders=Count("order_id", distinct=True),
+            )
+        )
+        _add_sales(list(sales))
+
+        watermark.last_order_id = order_ids[-1]
+        watermark.save(update_fields=["last_order_id", "updated_at"])
+        return len(order_ids)
+
+
+def _add_sales(sales):
+    """
+    Adds a batch's totals onto existing DailySales rows and creates the rest.
+    """
+    existing = {
+        (row.date, row.product_id, row.size): row
+        for row in DailySales.objects.filter(
+            date__in={sale["day"] for sale in sales},
+            product_id__in={sale["product_id"] for sale in sales},
+        )
+    }
+
+    to_create, to_update = [], []
+    for sale in sales:
+        key = (sale["day"], sale["product_id"], sale["line_size"])
+        row = existing.get(key)
+        if row is None:
+            to_create.append(DailySales(
+                date=sale["day"],
+                product_id=sale["product_id"],
+                size=sale["line_size"],
+                units=sale["units"],
+                revenue=sale["revenue"],
+                orders=sale["orders"],
+            ))
+        else:
+            row.units += sale["units"]
+            row.revenue += sale["revenue"]
+            row.orders += sale["orders"]
+            to_update.append(row)
+
+    DailySales.objects.bulk_create(to_create)
+    DailySales.objects.bulk_update(to_update, ["units", "revenue", "orders"])
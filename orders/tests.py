@@ -1,3 +1,776 @@
-from django.test import TestCase
+import copy
+import csv
+import threading
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from products.models import Product, ProductSize, StaleStockSummary, StockShard, WishlistItem
+from products.stock import sync_sharded_stock, take_from_shards
+from products.tests import QueryBudgetMixin, seed_products
+from .badges import badge_counts
+from .digest import send_order_digest
+from .models import Cart, CartItem, CartItemQuerySet, CheckoutToken, DailySales, Order, OrderItem, OutboxEmail, StockReservation
+from .outbox import MAX_ATTEMPTS, drain_outbox
+from .paginators import EstimatedCountPaginator
+from .rollup import refresh_sales_rollup
+
+
+class ConcurrentCartUpdateTests(TransactionTestCase):
+    """
+    Hammers one cart line from several threads (each with its own DB
+    connection) and checks that every applied increment is reflected in
+    the final quantity and that stock is never exceeded.
+    """
+
+    THREADS = 8
+    ATTEMPTS = 15
+
+    def setUp(self):
+        user = User.objects.create_user("stress", password="pw")
+        self.cart = Cart.objects.create(user=user)
+
+    def _hammer(self, operation):
+        applied = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(self.ATTEMPTS):
+                    while True:
+                        try:
+                            result = operation()
+                            break
+                        except OperationalError:
+                            # SQLite reports a busy database instead of waiting
+                            continue
+                    if result:
+                        with lock:
+                            applied.append(result)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(applied)
+
+    def test_no_lost_increments_without_sizes(self):
+        product = Product.objects.create(name="Saree", description="-", price=10)
+
+        applied = self._hammer(lambda: CartItem.objects.increment(self.cart.id, product))
+
+        line = CartItem.objects.get(cart=self.cart, product=product)
+        self.assertEqual(applied, self.THREADS * self.ATTEMPTS)
+        self.assertEqual(line.quantity, applied)
+
+    def test_insert_race_lands_on_existing_line(self):
+        # The other request's INSERT wins between this one's UPDATE (0 rows)
+        # and its INSERT: the partial unique constraint must reject the
+        # duplicate NULL-size line so the retry bumps the existing one
+        product = Product.objects.create(name="Saree", description="-", price=10)
+        CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        update = CartItemQuerySet.update
+        missed = []
+
+        def update_after_race(queryset, **kwargs):
+            if not missed:
+                missed.append(True)
+                return 0
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(CartItemQuerySet, "update", update_after_race):
+            self.assertTrue(CartItem.objects.increment(self.cart.id, product))
+
+        self.assertEqual(
+            list(CartItem.objects.filter(cart=self.cart).values_list("quantity", flat=True)), [2]
+        )
+
+    def test_increments_stop_at_stock(self):
+        product = Product.objects.create(name="Kurti", description="-", price=10, has_sizes=True)
+        ProductSize.objects.create(product=product, size="M", stock=50)
+
+        applied = self._hammer(lambda: CartItem.objects.increment(self.cart.id, product, "M"))
+
+        line = CartItem.objects.get(cart=self.cart, product=product, size="M")
+        self.assertEqual(applied, 50)
+        self.assertEqual(line.quantity, 50)
+
+    def test_no_lost_decrements(self):
+        product = Product.objects.create(name="Saree", description="-", price=10)
+        line = CartItem.objects.create(
+            cart=self.cart, product=product, quantity=self.THREADS * self.ATTEMPTS + 5
+        )
+
+        applied = self._hammer(lambda: CartItem.objects.decrement(line.id))
+
+        line.refresh_from_db()
+        self.assertEqual(applied, self.THREADS * self.ATTEMPTS)
+        self.assertEqual(line.quantity, 5)
+
+
+@override_settings(ADMIN_NOTIFICATION_EMAILS=["admin@example.com"])
+class OutboxTests(TestCase):
+    """
+    Checkout only queues emails; drain_outbox sends them over one
+    connection (locmem backend in tests) and retries failures.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", email="buyer@example.com", password="pw")
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        product = Product.objects.create(name="Saree", description="-", price=10)
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+
+    def _checkout(self):
+        return self.client.post(reverse("orders:place_order"), {
+            "full_name": "Buyer", "phone": "1", "address": "Street 1",
+        })
+
+    def test_checkout_queues_emails_without_sending(self):
+        self._checkout()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count(), 2)
+
+    def test_drain_sends_batch_over_one_connection(self):
+        self._checkout()
+
+        with mock.patch("orders.outbox.get_connection", wraps=mail.get_connection) as get_connection:
+            self.assertEqual(drain_outbox(), (2, 0))
+
+        get_connection.assert_called_once()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["admin@example.com", "buyer@example.com"])
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.SENT).exists())
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        self._checkout()
+
+        with mock.patch("django.core.mail.EmailMessage.send", side_effect=OSError("relay down")):
+            self.assertEqual(drain_outbox(), (0, 2))
+            email = OutboxEmail.objects.first()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertEqual(drain_outbox(), (0, 0))
+
+            for _ in range(MAX_ATTEMPTS - 1):
+                OutboxEmail.objects.update(next_attempt_at=timezone.now())
+                drain_outbox()
+
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.FAILED).count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(
+    ADMIN_NOTIFICATION_EMAILS=["admin@example.com"],
+    ADMIN_ORDER_DIGEST_MINUTES=15,
+    ADMIN_ORDER_ALERT_THRESHOLD=Decimal("100"),
+)
+class OrderDigestTests(TestCase):
+    """
+    In digest mode admins get one summary email per window, plus
+    per-order alerts for orders above the threshold.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", email="buyer@example.com", password="pw")
+        self.product = Product.objects.create(name="Saree", description="-", price=60)
+
+    def _order(self, quantity, minutes_ago=5):
+        order = Order.objects.create(
+            user=self.user, full_name="Buyer", phone="1", address="-",
+            subtotal=self.product.price * quantity, item_count=quantity,
+        )
+        OrderItem.objects.create(
+            order=order, product=self.product, quantity=quantity, unit_price=self.product.price
+        )
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return order
+
+    def test_only_large_orders_queue_an_admin_alert(self):
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        for quantity in (1, 2):
+            CartItem.objects.create(cart=cart, product=self.product, quantity=quantity)
+            self.client.post(reverse("orders:place_order"), {
+                "full_name": "Buyer", "phone": "1", "address": "Street 1",
+            })
+
+        kinds = list(OutboxEmail.objects.order_by("order_id", "kind").values_list("kind", flat=True))
+        self.assertEqual(kinds, [
+            OutboxEmail.CUSTOMER_CONFIRMATION,
+            OutboxEmail.ADMIN_NEW_ORDER,
+            OutboxEmail.CUSTOMER_CONFIRMATION,
+        ])
+
+    def test_one_email_for_all_orders_in_fixed_queries(self):
+        orders = [self._order(quantity) for quantity in (1, 2, 3, 4, 5)]
+        self._order(1, minutes_ago=0)  # too fresh, left for the next digest
+
+        # latest digest, orders, items, digest insert
+        with self.assertNumQueries(4):
+            self.assertEqual(send_order_digest(), 5)
+
+        self.assertEqual(len(mail.outbox), 1)
+        body = mail.outbox[0].body
+        for order in orders:
+            self.assertIn(f"Order #{order.id} ", body)
+        self.assertIn("€900.00 in total", body)
+
+    def test_waits_for_the_window(self):
+        self._order(1)
+        send_order_digest()
+        self._order(2)
+
+        self.assertEqual(send_order_digest(), 0)
+        self.assertEqual(send_order_digest(force=True), 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class BadgeTests(TestCase):
+    """
+    Cart and wishlist badges cost no query once cached, and every view
+    that changes the cart or wishlist keeps the cached counts right.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("shopper", password="pw")
+        self.products = seed_products(6)
+        self.client.force_login(self.user)
+
+    def _page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("products:wishlist"))
+        return len(queries)
+
+    def assertBadges(self, cart, wishlist):
+        self.assertEqual(badge_counts(self.user.id), {"cart": cart, "wishlist": wishlist})
+
+    def test_cached_badges_add_no_queries(self):
+        self.client.get(reverse("products:wishlist"))  # warms the badges
+        with_badges = self._page_queries()
+
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]["OPTIONS"]["context_processors"].remove("orders.context_processors.badges")
+        with override_settings(TEMPLATES=templates):
+            self.assertEqual(self._page_queries(), with_badges)
+
+    def test_every_change_keeps_the_counts(self):
+        kurti, other, *wished = self.products
+        self.client.get(reverse("orders:cart"))
+        self.assertBadges(0, 0)
+
+        add = reverse("orders:add_to_cart", args=[kurti.id])
+        self.client.post(add, {"size": "S"})
+        self.client.post(add, {"size": "S"})
+        self.assertBadges(2, 0)
+
+        line = CartItem.objects.get(product=kurti)
+        update = reverse("orders:update_cart_item", args=[line.id])
+        self.client.post(update, {"action": "increase"})
+        self.assertBadges(3, 0)
+        self.client.post(update, {"action": "decrease"})
+        self.assertBadges(2, 0)
+
+        self.client.post(reverse("orders:add_to_cart", args=[other.id]), {"size": "M"})
+        self.assertBadges(3, 0)
+        self.client.post(reverse("orders:remove_from_cart", args=[CartItem.objects.get(product=other).id]))
+        self.assertBadges(2, 0)
+
+        for product in wished:
+            self.client.post(reverse("products:add_to_wishlist", args=[product.id]))
+        self.client.post(reverse("products:add_to_wishlist", args=[wished[0].id]))  # already there
+        self.assertBadges(2, 4)
+
+        items = list(WishlistItem.objects.order_by("id"))
+        self.client.post(reverse("products:remove_from_wishlist", args=[items[0].id]))
+        self.assertBadges(2, 3)
+
+        self.client.post(reverse("products:move_to_cart", args=[items[1].id]), {"size": "M"})
+        self.assertBadges(3, 2)
+
+        self.client.post(reverse("products:move_all_to_cart"), {"all": "1", "size": "L"})
+        self.assertBadges(5, 0)
+
+        self.client.post(reverse("orders:place_order"), {
+            "full_name": "Shopper", "phone": "1", "address": "Street 1", "checkout_token": uuid.uuid4(),
+        })
+        self.assertBadges(0, 0)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class StockReservationTests(TestCase):
+    """
+    Cart adds hold sized stock for a while; other carts only see what is
+    left, and checkout turns the holds into the stock decrement.
+    """
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Kurti", description="-", price=10, has_sizes=True)
+        self.size = ProductSize.objects.create(product=self.product, size="M", stock=2)
+        self.carts = [
+            Cart.objects.create(user=User.objects.create_user(f"shopper{n}", password="pw"))
+            for n in range(2)
+        ]
+
+    def _add(self, cart):
+        return CartItem.objects.increment(cart.id, self.product, "M")
+
+    def test_holds_limit_other_carts(self):
+        first, second = self.carts
+        self.assertTrue(self._add(first))
+        self.assertTrue(self._add(first))
+        self.assertFalse(self._add(second))
+
+        hold = StockReservation.objects.get()
+        self.assertEqual(hold.quantity, 2)
+
+        StockReservation.objects.update(expires_at=timezone.now())
+        self.assertTrue(self._add(second))
+
+    def test_decrement_releases_held_units(self):
+        first, second = self.carts
+        self._add(first)
+        self._add(first)
+        line = CartItem.objects.get(cart=first)
+
+        CartItem.objects.decrement(line.id)
+
+        self.assertEqual(StockReservation.objects.get().quantity, 1)
+        self.assertTrue(self._add(second))
+
+    def test_checkout_converts_holds(self):
+        first, _ = self.carts
+        self._add(first)
+        self._add(first)
+        self.client.force_login(first.user)
+
+        response = self.client.post(reverse("orders:place_order"), {
+            "full_name": "Buyer", "phone": "1", "address": "Street 1",
+        })
+
+        self.assertRedirects(response, reverse("orders:order_success"), fetch_redirect_response=False)
+        self.size.refresh_from_db()
+        self.assertEqual(self.size.stock, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_refreshes_summary_after_commit(self):
+        first, _ = self.carts
+        self._add(first)
+        self.client.force_login(first.user)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse("orders:place_order"), {
+                "full_name": "Buyer", "phone": "1", "address": "Street 1",
+            })
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_stock, 2)
+
+        for callback in callbacks:
+            callback()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_stock, 1)
+        self.assertFalse(StaleStockSummary.objects.exists())
+
+    def test_failed_summary_refresh_is_retried(self):
+        first, _ = self.carts
+        self._add(first)
+        self.client.force_login(first.user)
+
+        with mock.patch("products.stock.refresh_stock_summary", side_effect=OperationalError("down")):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("orders:place_order"), {
+                    "full_name": "Buyer", "phone": "1", "address": "Street 1",
+                })
+        self.assertRedirects(response, reverse("orders:order_success"), fetch_redirect_response=False)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_stock, 2)  # stale, but marked
+        self.assertEqual(StaleStockSummary.objects.get().product, self.product)
+
+        call_command("rebuild_stock_summary", "--stale", stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.total_stock, 1)
+        self.assertFalse(StaleStockSummary.objects.exists())
+
+    def test_checkout_rechecks_expired_holds(self):
+        first, second = self.carts
+        self._add(first)
+        self._add(first)
+        StockReservation.objects.update(expires_at=timezone.now())
+        self._add(second)
+        self.client.force_login(first.user)
+
+        response = self.client.post(reverse("orders:place_order"), {
+            "full_name": "Buyer", "phone": "1", "address": "Street 1",
+        })
+
+        self.assertRedirects(response, reverse("orders:cart"), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+    def test_add_units_holds_in_bulk(self):
+        first, second = self.carts
+        saree = Product.objects.create(name="Saree", description="-", price=30)
+        self._add(first)
+
+        added = CartItem.objects.add_units(second.id, [(self.product, "M"), (saree, None)])
+        self.assertEqual(added, {(self.product.id, "M"), (saree.id, None)})
+        # Only one unit of M was left for the second cart
+        self.assertEqual(CartItem.objects.add_units(second.id, [(self.product, "M")]), set())
+
+        line = CartItem.objects.get(cart=second, size="M")
+        self.assertEqual(line.reservation.quantity, 1)
+        self.assertEqual(CartItem.objects.add_units(second.id, [(saree, None)]), {(saree.id, None)})
+        self.assertEqual(CartItem.objects.get(cart=second, product=saree).quantity, 2)
+
+
+class ShardedStockTests(TestCase):
+    """
+    Sizes with shards > 0 keep their stock in StockShard rows; checkout
+    takes from the shards and syncs ProductSize.stock after commit.
+    """
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Kurti", description="-", price=10, has_sizes=True)
+        self.size = ProductSize.objects.create(product=self.product, size="M", stock=10, shards=4)
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.force_login(self.user)
+
+    def _checkout(self, quantity):
+        CartItem.objects.create(cart=self.cart, product=self.product, size="M", quantity=quantity)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse("orders:place_order"), {
+                "full_name": "Buyer", "phone": "1", "address": "Street 1",
+            })
+
+    def test_save_rebalances_shards(self):
+        self.assertEqual(
+            list(self.size.stock_shards.order_by("index").values_list("stock", flat=True)),
+            [3, 3, 2, 2],
+        )
+
+        self.size.stock = 5
+        self.size.save()
+
+        self.assertEqual(sum(self.size.stock_shards.values_list("stock", flat=True)), 5)
+
+    def test_rebalance_during_a_take_keeps_the_sale(self):
+        edited = ProductSize.objects.get(pk=self.size.pk)  # e.g. opened in the admin
+        # A checkout takes 3 units; its sync has not run yet. On PostgreSQL
+        # the rebalance below waits on the shard lock until this commits.
+        with transaction.atomic():
+            self.assertTrue(take_from_shards(self.size.id, 3))
+
+        edited.shards = 2  # only the shard count changes
+        edited.save()
+
+        self.size.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(list(self.size.stock_shards.order_by("index").values_list("stock", flat=True)), [4, 3])
+        self.assertEqual(self.size.stock, 7)
+        self.assertEqual(self.product.total_stock, 7)
+
+    def test_sync_without_shard_rows_keeps_the_stock(self):
+        large = ProductSize.objects.create(product=self.product, size="L", stock=6)
+        ProductSize.objects.filter(pk=large.pk).update(shards=3)  # rows not built yet
+
+        sync_sharded_stock([large.id])
+        large.refresh_from_db()
+        self.assertEqual(large.stock, 6)
+
+    def test_checkout_takes_from_shards(self):
+        self._checkout(2)
+        # Larger than any single shard: drained across several
+        self._checkout(5)
+
+        self.size.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(sum(self.size.stock_shards.values_list("stock", flat=True)), 3)
+        self.assertEqual(self.size.stock, 3)
+        self.assertEqual(self.product.total_stock, 3)
+
+    def test_checkout_fails_beyond_shard_total(self):
+        response = self._checkout(11)
+
+        self.assertRedirects(response, reverse("orders:cart"), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(sum(StockShard.objects.values_list("stock", flat=True)), 10)
+
+    def test_sharded_sizes_take_no_holds(self):
+        self.assertTrue(CartItem.objects.increment(self.cart.id, self.product, "M"))
+        self.assertEqual(
+            CartItem.objects.add_units(self.cart.id, [(self.product, "M")]), {(self.product.id, "M")}
+        )
+
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_failed_stock_sync_keeps_the_order(self):
+        with mock.patch("orders.views.sync_sharded_stock", side_effect=OperationalError("down")):
+            response = self._checkout(1)
+
+        self.assertRedirects(response, reverse("orders:order_success"), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class IdempotentCheckoutTests(TestCase):
+    """
+    Re-submitting the checkout form with the same token redirects to the
+    success page without placing a second order.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = Product.objects.create(name="Saree", description="-", price=10)
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+    def _submit(self, token):
+        return self.client.post(reverse("orders:place_order"), {
+            "full_name": "Buyer", "phone": "1", "address": "Street 1",
+            "checkout_token": token,
+        })
+
+    def test_form_embeds_a_token(self):
+        response = self.client.get(reverse("orders:place_order"))
+
+        self.assertContains(response, 'name="checkout_token"')
+
+    def test_resubmission_does_not_place_a_second_order(self):
+        token = "0b5e8a52-4c1b-4a0e-9d0e-1c2a3b4c5d6e"
+        self._submit(token)
+        # The retry arrives with something in the cart again
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+        with self.assertNumQueries(3):  # session, user, token lookup
+            response = self._submit(token)
+
+        self.assertRedirects(response, reverse("orders:order_success"), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CheckoutToken.objects.get().order, Order.objects.get())
+
+    def test_failed_checkout_releases_the_token(self):
+        token = "0b5e8a52-4c1b-4a0e-9d0e-1c2a3b4c5d6e"
+        self.product.has_sizes = True
+        self.product.save()
+        CartItem.objects.update(size="M")
+        self._submit(token)  # size M does not exist
+
+        self.assertFalse(CheckoutToken.objects.exists())
+
+
+class OrderSnapshotTests(TestCase):
+    """
+    Orders keep the prices they were placed at.
+    """
+
+    def test_checkout_records_prices_and_totals(self):
+        user = User.objects.create_user("buyer", password="pw")
+        cart = Cart.objects.create(user=user)
+        product = Product.objects.create(name="Saree", description="-", price="12.50")
+        CartItem.objects.create(cart=cart, product=product, quantity=3)
+        self.client.force_login(user)
+        self.client.post(reverse("orders:place_order"), {
+            "full_name": "Buyer", "phone": "1", "address": "Street 1",
+        })
+
+        product.price = 99
+        product.save()
+
+        order = Order.objects.get()
+        self.assertEqual(order.subtotal, Decimal("37.50"))
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.items.get().unit_price, Decimal("12.50"))
+
+
+class SalesRollupTests(TestCase):
+    """
+    refresh_sales_rollup only reads orders after its watermark and adds
+    them onto the existing daily rows.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="pw")
+        self.product = Product.objects.create(name="Kurti", description="-", price=20, has_sizes=True)
+
+    def _order(self, quantity, size="M"):
+        order = Order.objects.create(user=self.user, full_name="Buyer", phone="1", address="-")
+        OrderItem.objects.create(
+            order=order, product=self.product, size=size, quantity=quantity, unit_price=15
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+    def test_incremental_refresh(self):
+        self._order(1)
+        self._order(2, size="L")
+        self.assertEqual(refresh_sales_rollup(), 2)
+
+        self._order(3)
+        self.assertEqual(refresh_sales_rollup(), 1)
+        self.assertEqual(refresh_sales_rollup(), 0)
+
+        medium = DailySales.objects.get(size="M")
+        self.assertEqual((medium.units, medium.revenue, medium.orders), (4, Decimal("60.00"), 2))
+        self.assertEqual(DailySales.objects.get(size="L").units, 2)
+
+
+class OrderExportTests(TestCase):
+    """
+    The admin export streams one CSV row per order line for the chosen dates.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser("staff", password="pw")
+        product = Product.objects.create(name="Dupatta", description="-", price=8)
+        for days_ago in (0, 10):
+            order = Order.objects.create(user=self.admin, full_name="Buyer", phone="1", address="-")
+            OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=7)
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        self.client.force_login(self.admin)
+
+    def test_export_date_range(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse("admin:orders_order_export"), {
+            "start": today - timedelta(days=1), "end": today,
+        })
+
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].endswith("Dupatta,,2,7.00,14.00"))
+
+    def test_invalid_range_shows_form(self):
+        response = self.client.get(reverse("admin:orders_order_export"), {
+            "start": "2026-02-01", "end": "2026-01-01",
+        })
+        self.assertContains(response, "must not be after")
+
+    def test_formula_cells_are_quoted(self):
+        Order.objects.update(full_name="=HYPERLINK(\"http://x\")", phone="+91 1", address="-1+2")
+        today = timezone.localdate()
+        response = self.client.get(reverse("admin:orders_order_export"), {"start": today, "end": today})
+
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[1][2:6], ["'=HYPERLINK(\"http://x\")", "", "'+91 1", "'-1+2"])
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """
+    Large admin lists are counted from the planner's estimate; small
+    lists and other databases keep the exact COUNT(*).
+    """
+
+    def setUp(self):
+        user = User.objects.create_user("shopper")
+        Order.objects.bulk_create([
+            Order(user=user, full_name="Buyer", phone="1", address="-") for _ in range(3)
+        ])
+        self.orders = Order.objects.order_by("-id")
+
+    def test_small_lists_count_exactly(self):
+        paginator = EstimatedCountPaginator(self.orders, 2)
+        with mock.patch.object(EstimatedCountPaginator, "_estimate", return_value=50):
+            self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_large_lists_use_the_estimate(self):
+        paginator = EstimatedCountPaginator(self.orders, 100)
+        with mock.patch.object(EstimatedCountPaginator, "_estimate", return_value=250000):
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 250000)
+        self.assertEqual(paginator.num_pages, 2500)
+
+    def test_estimate_is_read_from_the_plan(self):
+        self.assertIsNone(EstimatedCountPaginator(self.orders, 100)._estimate())  # SQLite
+
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value.fetchone.return_value = [[{"Plan": {"Plan Rows": 12345}}]]
+        with mock.patch.object(connection, "vendor", "postgresql"), \
+                mock.patch.object(connection, "cursor", return_value=cursor):
+            self.assertEqual(EstimatedCountPaginator(self.orders, 100).count, 12345)
+        sql = cursor.__enter__.return_value.execute.call_args[0][0]
+        self.assertTrue(sql.startswith("EXPLAIN (FORMAT JSON) SELECT"))
+
+
+class OrderViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every cart and checkout view runs a fixed number of queries,
+    however many lines the cart has.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("shopper", password="pw")
+        self.cart = Cart.objects.create(user=self.user)
+        self.sized = seed_products(3)
+        self._fill_cart(self.sized + seed_products(3, name="Saree", sized=False))
+        self.client.force_login(self.user)
+
+    def _fill_cart(self, products):
+        return CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, size="M" if product.has_sizes else None, quantity=2)
+            for product in products
+        ])
+
+    def _grow_cart(self):
+        self._fill_cart(seed_products(40) + seed_products(40, name="Saree", sized=False))
+
+    def _checkout(self):
+        return self.client.post(reverse("orders:place_order"), {
+            "full_name": "Shopper", "phone": "1", "address": "Street 1", "checkout_token": uuid.uuid4(),
+        })
+
+    def test_cart_detail(self):
+        response = self.assertFlatQueries(6, lambda: self.client.get(reverse("orders:cart")), self._grow_cart)
+        self.assertEqual(response.context["item_count"], 172)
+
+    def test_add_to_cart(self):
+        url = reverse("orders:add_to_cart", args=[self.sized[0].id])
+        self.assertFlatQueries(18, lambda: self.client.post(url, {"size": "S"}), self._grow_cart)
+
+    def test_update_cart_item(self):
+        item = CartItem.objects.filter(product=self.sized[0]).get()
+        url = reverse("orders:update_cart_item", args=[item.id])
+        for action, budget in (("increase", 14), ("decrease", 7)):
+            with self.subTest(action=action):
+                self.assertFlatQueries(budget, lambda: self.client.post(url, {"action": action}), self._grow_cart)
+
+    def test_remove_from_cart(self):
+        items = iter(CartItem.objects.filter(cart=self.cart).order_by("id"))
+        self.assertFlatQueries(
+            5,
+            lambda: self.client.post(reverse("orders:remove_from_cart", args=[next(items).id])),
+            self._grow_cart,
+        )
+
+    def test_place_order_form(self):
+        self.assertFlatQueries(6, lambda: self.client.get(reverse("orders:place_order")), self._grow_cart)
+
+    def test_place_order(self):
+        response = self.assertFlatQueries(27, self._checkout, self._grow_cart)
+        self.assertRedirects(response, reverse("orders:order_success"), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_order_success(self):
+        self.assertFlatQueries(4, lambda: self.client.get(reverse("orders:order_success")), self._grow_cart)
@@ -1,15 +1,17 @@
+import uuid
+
 from django.shortcuts import redirect, get_object_or_404, render
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Sum, When
 from django.http import JsonResponse
-from django.conf import settings
-from django.utils import timezone
-from django.template.loader import render_to_string
-from django.core.mail import EmailMultiAlternatives
 
 from products.models import Product, ProductSize
-from .models import Cart, CartItem, Order, OrderItem
+from products.stock import refresh_stock_after_commit, sync_sharded_stock, take_from_shards
+from .badges import adjust_badge, reset_badge
+from .models import Cart, CartItem, CheckoutToken, Order, OrderItem, StockReservation
+from .outbox import enqueue_order_emails
 
 
 # ==================================================
@@ -23,11 +25,13 @@ def cart_detail(request):
     Creates a cart automatically if one does not exist.
     """
     cart, _ = Cart.objects.get_or_create(user=request.user)
-    cart_items = cart.items.select_related("product")
+    summary = cart.summary()
 
     return render(request, "orders/cart.html", {
         "cart": cart,
-        "cart_items": cart_items,
+        "cart_items": summary["items"],
+        "cart_total": summary["total"],
+        "item_count": summary["item_count"],
     })
 
 
@@ -42,10 +46,11 @@ def add_to_cart(request, product_id):
 
     product = get_object_or_404(Product, id=product_id)
     cart, _ = Cart.objects.get_or_create(user=request.user)
-    selected_size = request.POST.get("size")
+    selected_size = None
 
     # 🔹 Products that have size variants
     if product.has_sizes:
+        selected_size = request.POST.get("size")
         if not selected_size:
             messages.error(request, "Please select a size.")
             return redirect("products:product_detail", product_id=product.id)
@@ -56,37 +61,17 @@ def add_to_cart(request, product_id):
             messages.error(request, f"{selected_size} is out of stock.")
             return redirect("products:product_detail", product_id=product.id)
 
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            size=selected_size,
-            defaults={"quantity": 1},
-        )
-
-        # Prevent exceeding available stock
-        if not created:
-            if item.quantity + 1 > ps.stock:
-                messages.error(
-                    request,
-                    f"Only {ps.stock} available for size {selected_size}."
-                )
-                return redirect("orders:cart")
-            item.quantity += 1
-            item.save()
-
-    # 🔹 Products without sizes (e.g. sarees)
-    else:
-        item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            size=None,
-            defaults={"quantity": 1},
-        )
-
-        if not created:
-            item.quantity += 1
-            item.save()
+    # Never goes above the size's stock minus other carts' holds
+    if not CartItem.objects.increment(cart.id, product, selected_size):
+        if product.has_sizes:
+            # Units in other shoppers' carts are held for them
+            available = ps.stock - StockReservation.objects.held_units(ps.id, exclude_cart_id=cart.id)
+            messages.error(request, f"Only {max(available, 0)} available for size {selected_size}.")
+        else:
+            messages.error(request, "Could not add this item, please try again.")
+        return redirect("orders:cart")
 
+    adjust_badge(request.user.id, "cart", 1)
     messages.success(request, "Added to cart.")
     return redirect("orders:cart")
 
@@ -95,34 +80,54 @@ def add_to_cart(request, product_id):
 def update_cart_item(request, item_id):
     """
     Updates cart item quantity via AJAX (increase / decrease).
+    Each change is a single conditional UPDATE; "applied" tells the page
+    whether it went through (an increase stops at the size's stock).
     """
     if request.method != "POST":
         return JsonResponse({"error": "Invalid request"}, status=400)
 
-    cart = get_object_or_404(Cart, user=request.user)
-    item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    item = get_object_or_404(
+        CartItem.objects.select_related("product"),
+        id=item_id,
+        cart__user=request.user,
+    )
+    cart_lines = CartItem.objects.filter(cart_id=item.cart_id)
     action = request.POST.get("action")
+    applied = False
+    message = None
 
     if action == "increase":
-        item.quantity += 1
-        item.save()
+        applied = CartItem.objects.increment(item.cart_id, item.product, item.size)
+        if applied:
+            adjust_badge(request.user.id, "cart", 1)
+        else:
+            message = "No more stock available for this size."
 
     elif action == "decrease":
-        if item.quantity > 1:
-            item.quantity -= 1
-            item.save()
-        else:
-            item.delete()
+        result = CartItem.objects.decrement(item.id)
+        applied = result is not None
+        if applied:
+            adjust_badge(request.user.id, "cart", -1)
+
+        if result != "decreased":
+            totals = cart_lines.totals()
             return JsonResponse({
+                "applied": applied,
                 "removed": True,
-                "cart_total": f"{cart.total_price():.2f}",
+                "cart_total": f"{totals['total']:.2f}",
+                "item_count": totals["item_count"],
             })
 
+    quantity = cart_lines.filter(pk=item.pk).values_list("quantity", flat=True).first() or 0
+    totals = cart_lines.totals()
     return JsonResponse({
+        "applied": applied,
+        "message": message,
         "removed": False,
-        "quantity": item.quantity,
-        "item_total": f"{item.total_price():.2f}",
-        "cart_total": f"{cart.total_price():.2f}",
+        "quantity": quantity,
+        "item_total": f"{item.product.price * quantity:.2f}",
+        "cart_total": f"{totals['total']:.2f}",
+        "item_count": totals["item_count"],
     })
 
 
@@ -133,6 +138,7 @@ def remove_from_cart(request, item_id):
     """
     item = get_object_or_404(CartItem, id=item_id, cart__user=request.user)
     item.delete()
+    adjust_badge(request.user.id, "cart", -item.quantity)
     messages.info(request, "Item removed from cart.")
     return redirect("orders:cart")
 
@@ -145,8 +151,16 @@ def remove_from_cart(request, item_id):
 def place_order(request):
     """
     Handles order placement, stock validation,
-    order creation, cart clearing, and email notifications.
+    order creation, cart clearing, and queues the email notifications.
     """
+    token = _checkout_token(request.POST.get("checkout_token"))
+
+    # A re-submitted form whose order already went through
+    if request.method == "POST" and token and CheckoutToken.objects.filter(
+        key=token, user=request.user, order__isnull=False
+    ).exists():
+        return redirect("orders:order_success")
+
     cart = get_object_or_404(Cart, user=request.user)
 
     if not cart.items.exists():
@@ -163,155 +177,182 @@ def place_order(request):
             return redirect("orders:place_order")
 
         with transaction.atomic():
+            if token:
+                # Claim the token first: a concurrent duplicate waits on the
+                # unique key here instead of on the stock locks, then sees
+                # the committed order. A failed checkout releases it.
+                try:
+                    with transaction.atomic():
+                        claim = CheckoutToken.objects.create(key=token, user=request.user)
+                except IntegrityError:
+                    return redirect("orders:order_success")
+
+            items = list(cart.items.select_related("product").order_by("id"))
+            if not items:
+                # Every early return below rolls back, releasing the token
+                transaction.set_rollback(True)
+                messages.error(request, "Your cart is empty.")
+                return redirect("orders:cart")
+
+            sized_items = [item for item in items if item.product.has_sizes]
+
+            # Lines with an active hold covering their quantity already own
+            # that stock (see StockReservation), so they skip the locking
+            # read and the stock check below. The stock UPDATE further down
+            # still locks their size rows until commit: checkouts of one
+            # size still queue there, only for less of the transaction.
+            holds = {
+                hold.cart_item_id: hold
+                for hold in StockReservation.objects.active().filter(cart_item__cart=cart)
+            }
+
+            # Hot sizes split into stock shards never lock their size row.
+            # They take no cart holds either, so the shard decrement is
+            # their whole stock check.
+            sharded = {}
+            if sized_items:
+                rows = Q()
+                for item in sized_items:
+                    rows |= Q(product_id=item.product_id, size=item.size)
+                sharded = {
+                    (product_id, size): ps_id
+                    for ps_id, product_id, size in ProductSize.objects.filter(
+                        rows, shards__gt=0
+                    ).values_list("id", "product_id", "size")
+                }
+
+            size_of_line = {}
+            unheld, from_shards = [], []
+            for item in sized_items:
+                hold = holds.get(item.id)
+                if (item.product_id, item.size) in sharded:
+                    size_of_line[item.id] = sharded[(item.product_id, item.size)]
+                    from_shards.append(item)
+                elif hold and hold.quantity >= item.quantity:
+                    size_of_line[item.id] = hold.product_size_id
+                else:
+                    unheld.append(item)
+
+            if unheld:
+                # Lock every affected size row in one statement, always in id
+                # order so concurrent checkouts cannot deadlock each other
+                rows = Q()
+                for item in unheld:
+                    rows |= Q(product_id=item.product_id, size=item.size)
+                locked = {}
+                for ps in ProductSize.objects.select_for_update().filter(rows).order_by("id"):
+                    locked.setdefault((ps.product_id, ps.size), ps)
+
+                # Units other carts hold on those sizes
+                held = dict(
+                    StockReservation.objects.active()
+                    .filter(product_size__in=[ps.id for ps in locked.values()])
+                    .exclude(cart_item__cart=cart)
+                    .values_list("product_size")
+                    .annotate(units=Sum("quantity"))
+                )
 
-            # Stock validation before creating order
-            for item in cart.items.select_related("product"):
-                if item.product.has_sizes:
-                    ps = get_object_or_404(ProductSize, product=item.product, size=item.size)
-                    if ps.stock < item.quantity:
+                # Stock validation against the locked rows
+                for item in unheld:
+                    ps = locked.get((item.product_id, item.size))
+                    if ps is None or ps.stock - held.get(ps.id, 0) < item.quantity:
+                        transaction.set_rollback(True)
                         messages.error(
                             request,
                             f"Not enough stock for {item.product.name} (Size {item.size})."
                         )
                         return redirect("orders:cart")
+                    size_of_line[item.id] = ps.id
+
+            # For sharded sizes the shard decrement is the stock check.
+            # Sizes are taken in id order, like the locks above.
+            for item in sorted(from_shards, key=lambda item: size_of_line[item.id]):
+                if not take_from_shards(size_of_line[item.id], item.quantity):
+                    transaction.set_rollback(True)
+                    messages.error(
+                        request,
+                        f"Not enough stock for {item.product.name} (Size {item.size})."
+                    )
+                    return redirect("orders:cart")
 
-            # Create order
+            # Create order, with its totals at today's prices
             order = Order.objects.create(
                 user=request.user,
                 full_name=full_name,
                 phone=phone,
                 address=address,
+                subtotal=sum(item.product.price * item.quantity for item in items),
+                item_count=sum(item.quantity for item in items),
             )
 
-            # Create order items and reduce stock
-            for item in cart.items.select_related("product"):
-                OrderItem.objects.create(
+            # Create order items
+            OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     product=item.product,
                     quantity=item.quantity,
                     size=item.size if item.product.has_sizes else None,
+                    unit_price=item.product.price,
                 )
-
-                if item.product.has_sizes:
-                    ps = ProductSize.objects.select_for_update().get(
-                        product=item.product,
-                        size=item.size,
-                    )
-                    ps.stock -= item.quantity
-                    ps.save()
-
-            # Clear cart after successful order
+                for item in items
+            ])
+
+            # Reduce stock in a single UPDATE. It bypasses the ProductSize
+            # signals, so the summary and catalog version are refreshed
+            # after commit, keeping the Product rows out of the lock window;
+            # the products are marked stale here in case that refresh fails.
+            row_items = [item for item in sized_items if (item.product_id, item.size) not in sharded]
+            if row_items:
+                decrements = {size_of_line[item.id]: item.quantity for item in row_items}
+                try:
+                    with transaction.atomic():
+                        ProductSize.objects.filter(id__in=decrements).update(stock=Case(
+                            *[When(id=ps_id, then=F("stock") - quantity)
+                              for ps_id, quantity in decrements.items()],
+                            default=F("stock"),
+                            output_field=ProductSize._meta.get_field("stock"),
+                        ))
+                except IntegrityError:
+                    # Stock was lowered below the holds (e.g. in the admin)
+                    transaction.set_rollback(True)
+                    messages.error(request, "Some items in your cart are no longer in stock.")
+                    return redirect("orders:cart")
+                refresh_stock_after_commit({item.product_id for item in row_items})
+
+            if from_shards:
+                sharded_ids = [size_of_line[item.id] for item in from_shards]
+                # The order is committed: a failed sync only leaves the
+                # ProductSize total stale until the next one, never a 500
+                transaction.on_commit(lambda: sync_sharded_stock(sharded_ids), robust=True)
+
+            # Emails are sent by the send_outbox worker once this commits
+            enqueue_order_emails(order)
+
+            if token:
+                claim.order = order
+                claim.save(update_fields=["order"])
+
+            # Clear cart after successful order (its holds go with it)
             cart.items.all().delete()
 
-        # Email notifications
-        try:
-            send_admin_order_email(order)
-        except Exception as e:
-            print("Admin email failed:", e)
-
-        try:
-            send_customer_order_email(order)
-        except Exception as e:
-            print("Customer email failed:", e)
+        reset_badge(request.user.id, "cart")
 
         messages.success(request, "Order placed successfully!")
         return redirect("orders:order_success")
 
-    return render(request, "orders/place_order.html")
-
-
-
-# ==================================================
-# ADMIN EMAIL (HTML)
-# ==================================================
-
-def send_admin_order_email(order):
-    """
-    Sends an HTML email notification to admin when a new order is placed.
-    """
-    items = order.items.select_related("product")
-
-    subject = f"New Order Placed - Order #{order.id}"
-
-    text_body = (
-        f"New order placed.\n\n"
-        f"Order ID: {order.id}\n"
-        f"Customer: {order.full_name}\n"
-        f"Email: {order.user.email}\n"
-        f"Phone: {order.phone}\n"
-        f"Address: {order.address}\n\n"
-        f"Items:\n" +
-        "\n".join([
-            f"- {i.product.name} | Qty: {i.quantity}" +
-            (f" | Size: {i.size}" if i.size else "")
-            for i in items
-        ])
-    )
-
-    html_body = render_to_string("emails/admin_new_order.html", {
-        "order": order,
-        "items": items,
-        "now": timezone.now(),
+    return render(request, "orders/place_order.html", {
+        "checkout_token": uuid.uuid4(),
     })
 
-    msg = EmailMultiAlternatives(
-        subject=subject,
-        body=text_body,
-        from_email=None,  # Uses DEFAULT_FROM_EMAIL
-        to=settings.ADMIN_NOTIFICATION_EMAILS,
-    )
-    msg.attach_alternative(html_body, "text/html")
-    msg.send(fail_silently=False)
-
-
-# ==================================================
-# CUSTOMER CONFIRMATION EMAIL
-# ==================================================
 
-def send_customer_order_email(order):
+def _checkout_token(value):
     """
-    Sends an order confirmation email to the customer.
+    The form's idempotency token as a UUID, or None if missing/invalid.
     """
-    customer_email = (order.user.email or "").strip()
-    if not customer_email:
-        return
-
-    items = order.items.select_related("product")
-
-    subject = f"Order Confirmed ✅ A&M Signature - Order #{order.id}"
-
-    text_body = (
-        f"Hi {order.full_name},\n\n"
-        f"Thank you for your order! Your order has been received.\n\n"
-        f"Order ID: {order.id}\n"
-        f"Placed on: {timezone.now().strftime('%d %b %Y, %H:%M')}\n\n"
-        f"Delivery Address:\n{order.address}\n\n"
-        f"Items:\n" +
-        "\n".join([
-            f"- {i.product.name} | Qty: {i.quantity}" +
-            (f" | Size: {i.size}" if i.size else "")
-            for i in items
-        ]) +
-        "\n\nWe’ll contact you when it’s out for delivery.\n"
-        "A&M Signature — Wear Your Story"
-    )
-
-    html_body = render_to_string("emails/customer_order_confirmation.html", {
-        "order": order,
-        "items": items,
-        "now": timezone.now(),
-        "brand_name": "A&M Signature",
-        "support_email": settings.DEFAULT_FROM_EMAIL,
-    })
-
-    msg = EmailMultiAlternatives(
-        subject=subject,
-        body=text_body,
-        from_email=None,
-        to=[customer_email],
-    )
-    msg.attach_alternative(html_body, "text/html")
-    msg.send(fail_silently=False)
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
 
 
 @login_required
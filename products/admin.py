@@ -9,7 +9,7 @@ class ProductSizeInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("name", "price", "available")
+    list_display = ("name", "price", "available", "in_stock", "total_stock")
     inlines = [ProductSizeInline]
 
 
@@ -0,0 +1,197 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date, urlencode
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET
+
+from .cache import catalog_version, stock_version
+from .models import Product
+from .pagination import keyset_page
+
+
+API_VERSION = "v1"
+MAX_PAGE_SIZE = 100
+
+# API field -> model fields it needs (id and created_at are always loaded
+# because the keyset cursor is built from them)
+PRODUCT_FIELDS = {
+    "id": [],
+    "name": ["name"],
+    "description": ["description"],
+    "price": ["price"],
+    "has_sizes": ["has_sizes"],
+    "in_stock": ["in_stock"],
+    "total_stock": ["total_stock"],
+    "sizes": ["size_mask", "in_stock_size_mask"],
+    "image": ["image"],
+    "created_at": [],
+    "url": [],
+}
+DEFAULT_FIELDS = [f for f in PRODUCT_FIELDS if f != "description"]
+
+
+# ==================================================
+# CONDITIONAL GET
+# ==================================================
+# Both validators come from the catalog and stock version stamps kept in
+# the shared cache (see products.checks), so an unchanged poll is answered
+# with a 304 before any DB access.
+
+def _catalog_etag(request, version):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]
+    return f"{API_VERSION}-{version}-{path_hash}"
+
+
+def _catalog_last_modified(version):
+    return datetime.fromtimestamp(version / 1e9, tz=timezone.utc)
+
+
+def _conditional(view):
+    """
+    Like django.views.decorators.http.condition, but the validators only
+    go on 200 and 304 responses: an error must not be cached as if it
+    were the current catalog.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        version = max(catalog_version(), stock_version())
+        etag = quote_etag(_catalog_etag(request, version))
+        last_modified = _catalog_last_modified(version)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp()),
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response.headers.setdefault("ETag", etag)
+            response.headers.setdefault("Last-Modified", http_date(last_modified.timestamp()))
+        return response
+
+    return wrapper
+
+
+def catalog_endpoint(view):
+    view = _conditional(view)
+    view = cache_control(public=True, no_cache=True)(view)
+    return require_GET(view)
+
+
+# ==================================================
+# SERIALIZATION
+# ==================================================
+
+def _parse_fields(request):
+    """
+    Returns the requested fields, or None if an unknown field was asked for.
+    """
+    raw = request.GET.get("fields")
+    if not raw:
+        return DEFAULT_FIELDS
+
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    if not fields or any(f not in PRODUCT_FIELDS for f in fields):
+        return None
+    return fields
+
+
+def _load_fields(fields):
+    columns = {"id", "created_at"}
+    for field in fields:
+        columns.update(PRODUCT_FIELDS[field])
+    return columns
+
+
+def _serialize(request, product, fields):
+    data = {}
+    for field in fields:
+        if field == "price":
+            data["price"] = str(product.price)
+        elif field == "sizes":
+            data["sizes"] = [
+                {"size": size, "in_stock": available}
+                for size, available in product.size_options
+            ]
+        elif field == "image":
+            data["image"] = request.build_absolute_uri(product.image.url) if product.image else None
+        elif field == "created_at":
+            data["created_at"] = product.created_at.isoformat()
+        elif field == "url":
+            data["url"] = request.build_absolute_uri(
+                reverse("products:product_detail", args=[product.id])
+            )
+        else:
+            data[field] = getattr(product, field)
+    return data
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+# ==================================================
+# ENDPOINTS
+# ==================================================
+
+@catalog_endpoint
+def product_list(request):
+    """
+    Paginated list of available products, newest first.
+    Query params: cursor, page_size (max 100), fields (comma separated).
+    """
+    fields = _parse_fields(request)
+    if fields is None:
+        return _error(f"Unknown field. Available: {', '.join(PRODUCT_FIELDS)}", 400)
+
+    try:
+        page_size = min(int(request.GET.get("page_size", 24)), MAX_PAGE_SIZE)
+    except ValueError:
+        return _error("page_size must be a number", 400)
+    if page_size < 1:
+        return _error("page_size must be positive", 400)
+
+    products, next_cursor = keyset_page(
+        Product.objects.filter(available=True).only(*_load_fields(fields)),
+        cursor=request.GET.get("cursor"),
+        page_size=page_size,
+    )
+
+    next_url = None
+    if next_cursor:
+        params = {"cursor": next_cursor, "page_size": page_size}
+        if "fields" in request.GET:
+            params["fields"] = ",".join(fields)
+        next_url = request.build_absolute_uri(
+            f"{reverse('api:product_list')}?{urlencode(params)}"
+        )
+
+    return JsonResponse({
+        "results": [_serialize(request, p, fields) for p in products],
+        "next": next_url,
+    })
+
+
+@catalog_endpoint
+def product_detail(request, product_id):
+    """
+    A single available product with its size availability.
+    """
+    fields = _parse_fields(request)
+    if fields is None:
+        return _error(f"Unknown field. Available: {', '.join(PRODUCT_FIELDS)}", 400)
+
+    product = (
+        Product.objects.filter(id=product_id, available=True)
+        .only(*_load_fields(fields))
+        .first()
+    )
+    if product is None:
+        return _error("Product not found", 404)
+
+    return JsonResponse(_serialize(request, product, fields))
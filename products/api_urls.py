@@ -0,0 +1,7 @@
+from django.urls import path
+from . import api
+app_name = 'api'
+urlpatterns = [
+    path('products/', api.product_list, name='product_list'),
+    path('products/<int:product_id>/', api.product_detail, name='product_detail'),
+]
@@ -0,0 +1,131 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+
+CATALOG_VERSION_KEY = "catalog:version"
+STOCK_VERSION_KEY = "catalog:stock-version"
+
+PAGE_TIMEOUT = 60 * 60 * 24  # Pages are invalidated by version, not by age
+LOCK_TIMEOUT = 30            # Upper bound on one rebuild
+LOCK_WAIT = 5                # How long a concurrent miss waits for the rebuild
+LOCK_POLL = 0.05
+
+# Response headers worth replaying from the cache
+CACHED_HEADERS = ("Content-Type", "X-Next-Page")
+
+
+# ==================================================
+# CATALOG VERSION
+# ==================================================
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # First use or evicted: a fresh timestamp can never match an old key
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump(key):
+    current = cache.get(key) or 0
+    cache.set(key, max(time.time_ns(), current + 1), None)
+
+
+def catalog_version():
+    """
+    Returns the current catalog version stamp (nanoseconds since the epoch
+    of the last catalog change). Every cached catalog page is keyed by it.
+    """
+    return _version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """
+    Moves the catalog to a new version, orphaning every cached page.
+    Called whenever a Product or ProductSize changes, and after a sale
+    only when it changed what a page shows (a size selling out).
+    """
+    _bump(CATALOG_VERSION_KEY)
+
+
+def stock_version():
+    """
+    Stamp of the last stock count change. Pages and facets only show
+    whether a size is in stock, but the API returns total_stock, so its
+    validators use this stamp as well.
+    """
+    return _version(STOCK_VERSION_KEY)
+
+
+def bump_stock_version():
+    _bump(STOCK_VERSION_KEY)
+
+
+# ==================================================
+# PAGE CACHE
+# ==================================================
+
+def page_cache_key(request):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"catalog:page:{catalog_version()}:{path_hash}"
+
+
+def _store(key, response):
+    headers = {h: response[h] for h in CACHED_HEADERS if h in response}
+    cache.set(key, (response.content, headers), PAGE_TIMEOUT)
+
+
+def _restore(cached):
+    content, headers = cached
+    response = HttpResponse(content)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def cache_catalog_page(view):
+    """
+    Serves anonymous GETs of a catalog view from the cache.
+
+    On a miss only one request rebuilds the page; concurrent misses wait
+    briefly for that result instead of all hitting the database at once.
+    Logged-in users always get a fresh render (their pages carry a CSRF
+    token and personal links).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != "GET" or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            return _restore(cached)
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, LOCK_TIMEOUT):
+            try:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    _store(key, response)
+            finally:
+                cache.delete(lock_key)
+            return response
+
+        # Another request is rebuilding this page: wait for its result
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            cached = cache.get(key)
+            if cached is not None:
+                return _restore(cached)
+
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,260 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.validators import DecimalValidator
+from django.db import connection, transaction
+
+from . import search
+from .cache import bump_catalog_version
+from .models import SIZE_ORDER, Product, ProductSize
+from .stock import rebalance_shards, refresh_stock_summary
+
+
+# Product columns, in file order; sizes follow as stock_<SIZE> (CSV)
+# or a {"<SIZE>": stock} object under "sizes" (JSONL)
+PRODUCT_FIELDS = ["id", "name", "description", "price", "image", "available", "has_sizes"]
+SIZE_COLUMNS = {size: f"stock_{size}" for size in SIZE_ORDER}
+CSV_FIELDS = PRODUCT_FIELDS + list(SIZE_COLUMNS.values())
+
+# Product fields overwritten when an imported id already exists
+UPDATE_FIELDS = ["name", "description", "price", "image", "available", "has_sizes"]
+
+# The price column's precision; a wider value would fail in the database
+_price_field = Product._meta.get_field("price")
+PRICE_VALIDATOR = DecimalValidator(_price_field.max_digits, _price_field.decimal_places)
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n"}
+
+
+class CatalogError(ValueError):
+    pass
+
+
+# ==================================================
+# EXPORT
+# ==================================================
+
+def export_products(chunk_size=500):
+    """
+    Yields one record per product, streamed from the database in chunks
+    with each chunk's sizes prefetched in one query.
+    """
+    products = (
+        Product.objects.order_by("id")
+        .only(*PRODUCT_FIELDS)
+        .prefetch_related("sizes")
+        .iterator(chunk_size=chunk_size)
+    )
+    for product in products:
+        yield {
+            "id": product.id,
+            "name": product.name,
+            "description": product.description,
+            "price": str(product.price),
+            "image": product.image.name if product.image else "",
+            "available": product.available,
+            "has_sizes": product.has_sizes,
+            "sizes": {ps.size: ps.stock for ps in product.sizes.all()},
+        }
+
+
+def to_csv_row(record):
+    row = {field: record[field] for field in PRODUCT_FIELDS}
+    for size, column in SIZE_COLUMNS.items():
+        row[column] = record["sizes"].get(size, "")
+    return row
+
+
+# ==================================================
+# IMPORT
+# ==================================================
+
+def from_csv_row(row):
+    """
+    A CSV row as an import record; an empty stock_<SIZE> cell means the
+    product does not come in that size.
+    """
+    record = {field: row.get(field, "") for field in PRODUCT_FIELDS}
+    record["sizes"] = {
+        size: row[column]
+        for size, column in SIZE_COLUMNS.items()
+        if (row.get(column) or "").strip() != ""
+    }
+    return record
+
+
+def _bool(value, field, default):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else "").strip().lower()
+    if not text:
+        return default
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise CatalogError(f"{field}: expected true/false, got {value!r}")
+
+
+def _check_length(field, value):
+    """
+    bulk_create skips model validation, so an overlong value would only
+    fail in the database, taking the whole batch with it.
+    """
+    max_length = Product._meta.get_field(field).max_length
+    if len(value) > max_length:
+        raise CatalogError(f"{field}: at most {max_length} characters, got {len(value)}")
+
+
+def clean_record(record):
+    """
+    Validates an import record and converts it to model values.
+    Raises CatalogError on bad input.
+    """
+    if not isinstance(record, dict):
+        raise CatalogError(f"expected an object, got {type(record).__name__}")
+
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise CatalogError("name is required")
+    _check_length("name", name)
+
+    try:
+        price = Decimal(str(record.get("price")).strip())
+    except (InvalidOperation, TypeError):
+        raise CatalogError(f"price: not a number: {record.get('price')!r}")
+    if not price.is_finite() or price < 0:
+        raise CatalogError(f"price: must be a finite amount of at least 0, got {record.get('price')!r}")
+    try:
+        PRICE_VALIDATOR(price)
+    except ValidationError:
+        raise CatalogError(
+            f"price: at most {PRICE_VALIDATOR.max_digits} digits, "
+            f"{PRICE_VALIDATOR.decimal_places} after the point: {record.get('price')!r}"
+        )
+
+    product_id = record.get("id")
+    try:
+        product_id = int(product_id) if str(product_id or "").strip() else None
+    except ValueError:
+        raise CatalogError(f"id: not an integer: {product_id!r}")
+
+    raw_sizes = record.get("sizes") or {}
+    if not isinstance(raw_sizes, dict):
+        raise CatalogError(f"sizes: expected an object, got {type(raw_sizes).__name__}")
+    sizes = {}
+    for size, stock in raw_sizes.items():
+        if size not in SIZE_ORDER:
+            raise CatalogError(f"unknown size {size!r}")
+        try:
+            sizes[size] = int(stock)
+        except (TypeError, ValueError):
+            raise CatalogError(f"stock of {size}: not an integer: {stock!r}")
+        if sizes[size] < 0:
+            raise CatalogError(f"stock of {size}: must not be negative")
+
+    image = str(record.get("image") or "")
+    _check_length("image", image)
+
+    return {
+        "id": product_id,
+        "name": name,
+        "description": str(record.get("description") or ""),
+        "price": price,
+        "image": image,
+        "available": _bool(record.get("available"), "available", default=True),
+        "has_sizes": _bool(record.get("has_sizes"), "has_sizes", default=bool(sizes)),
+        "sizes": sizes,
+    }
+
+
+def import_batch(records):
+    """
+    Upserts one batch of cleaned records in a single transaction:
+    products by id with one bulk_create(update_conflicts=True) (records
+    without an id are created), then their sizes with one read, one
+    bulk_update and one bulk_create. Bulk writes skip the model signals,
+    so the search index, stock summary and shards are refreshed here.
+
+    Returns (products, sizes) written.
+    """
+    # A repeated id within the batch: the last record wins
+    records = list({
+        (r["id"] if r["id"] is not None else ("new", n)): r
+        for n, r in enumerate(records)
+    }.values())
+
+    with transaction.atomic():
+        existing = [r for r in records if r["id"] is not None]
+        new = [r for r in records if r["id"] is None]
+
+        products = []
+        if existing:
+            products += Product.objects.bulk_create(
+                [_product(r) for r in existing],
+                update_conflicts=True,
+                unique_fields=["id"],
+                update_fields=UPDATE_FIELDS,
+            )
+        products += Product.objects.bulk_create([_product(r) for r in new])
+
+        product_ids = [product.id for product in products]
+        wanted = {
+            (product.id, size): stock
+            for product, record in zip(products, existing + new)
+            for size, stock in record["sizes"].items()
+        }
+
+        current = {}
+        for ps in ProductSize.objects.filter(product_id__in=product_ids).order_by("id"):
+            current.setdefault((ps.product_id, ps.size), ps)
+
+        to_update, to_create = [], []
+        for (product_id, size), stock in wanted.items():
+            ps = current.get((product_id, size))
+            if ps is None:
+                to_create.append(ProductSize(
+                    product_id=product_id, size=size, stock=stock, order=SIZE_ORDER[size],
+                ))
+            elif ps.stock != stock:
+                ps.stock = stock
+                to_update.append(ps)
+
+        ProductSize.objects.bulk_update(to_update, ["stock"])
+        ProductSize.objects.bulk_create(to_create)
+
+        for ps in to_update:
+            if ps.shards:
+                rebalance_shards(ps)
+
+        search.index_products(product_ids)
+        refresh_stock_summary(product_ids)
+
+    return len(products), len(to_update) + len(to_create)
+
+
+def finish_import():
+    """
+    Realigns the id sequences after rows were inserted with explicit ids
+    (PostgreSQL) and invalidates the cached catalog pages.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), [Product, ProductSize])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    bump_catalog_version()
+
+
+def _product(record):
+    return Product(
+        id=record["id"],
+        name=record["name"],
+        description=record["description"],
+        price=record["price"],
+        image=record["image"] or None,
+        available=record["available"],
+        has_sizes=record["has_sizes"],
+    )
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+PER_PROCESS_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+DATABASE_BACKENDS = ("django.core.cache.backends.db.DatabaseCache",)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    The catalog version that invalidates cached pages and API validators
+    lives in the default cache. A per-process cache never sees bumps made
+    by other workers or management commands, so they would serve stale
+    pages (and 304s) indefinitely; a database cache turns every cached
+    read into queries, and its incr (used by the cart badges) is a
+    read-then-write that loses concurrent updates.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in PER_PROCESS_BACKENDS:
+        return [Error(
+            f"The default cache ({backend}) is per-process, so catalog "
+            "invalidation does not reach other workers.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to Redis.",
+            id="products.E001",
+        )]
+    if backend in DATABASE_BACKENDS:
+        return [Error(
+            f"The default cache ({backend}) costs a query on every cached page, "
+            "badge and version read, and its incr is not atomic.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to Redis.",
+            id="products.E002",
+        )]
+    return []
@@ -0,0 +1,122 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .cache import PAGE_TIMEOUT, catalog_version
+from .models import SIZE_CHOICES, Product, ProductSize
+
+
+# (slug, label, min price inclusive, max price exclusive)
+PRICE_BANDS = [
+    ("under-50", "Under €50", None, Decimal("50")),
+    ("50-100", "€50 – €100", Decimal("50"), Decimal("100")),
+    ("100-200", "€100 – €200", Decimal("100"), Decimal("200")),
+    ("200-plus", "€200 and above", Decimal("200"), None),
+]
+
+# (slug, label, has_sizes)
+PRODUCT_TYPES = [
+    ("kurti", "Kurtis", True),
+    ("saree", "Sarees", False),
+]
+
+SIZE_VALUES = [value for value, _ in SIZE_CHOICES]
+PRICE_SLUGS = {band[0] for band in PRICE_BANDS}
+TYPE_SLUGS = {product_type[0] for product_type in PRODUCT_TYPES}
+
+
+def parse_filters(params):
+    """
+    Reads the selected facet options from a QueryDict.
+    Unknown values are ignored.
+    """
+    return {
+        "price": [v for v in params.getlist("price") if v in PRICE_SLUGS],
+        "size": [v for v in params.getlist("size") if v in SIZE_VALUES],
+        "type": [v for v in params.getlist("type") if v in TYPE_SLUGS],
+    }
+
+
+def _alias(prefix, slug):
+    return f"{prefix}_{slug.replace('-', '_')}"
+
+
+def _price_q(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lt=high)
+    return q
+
+
+def filter_products(queryset, filters):
+    """
+    Applies the selected facets: options within a facet are OR-ed,
+    facets are AND-ed. Everything stays in the one listing query.
+    """
+    if filters["price"]:
+        q = Q()
+        for slug, _, low, high in PRICE_BANDS:
+            if slug in filters["price"]:
+                q |= _price_q(low, high)
+        queryset = queryset.filter(q)
+
+    if filters["type"]:
+        queryset = queryset.filter(has_sizes__in=[
+            has_sizes for slug, _, has_sizes in PRODUCT_TYPES if slug in filters["type"]
+        ])
+
+    if filters["size"]:
+        queryset = queryset.filter(Exists(
+            ProductSize.objects.filter(
+                product=OuterRef("pk"),
+                size__in=filters["size"],
+                stock__gt=0,
+            )
+        ))
+
+    return queryset
+
+
+def _compute_facet_counts():
+    products = Product.objects.filter(available=True)
+
+    # One aggregate query for the price and type facets
+    aggregates = {
+        _alias("price", slug): Count("id", filter=_price_q(low, high))
+        for slug, _, low, high in PRICE_BANDS
+    }
+    aggregates.update({
+        _alias("type", slug): Count("id", filter=Q(has_sizes=has_sizes))
+        for slug, _, has_sizes in PRODUCT_TYPES
+    })
+    totals = products.aggregate(**aggregates)
+
+    # One grouped query for the in-stock sizes
+    size_totals = dict(
+        ProductSize.objects.filter(stock__gt=0, product__available=True)
+        .values_list("size")
+        .annotate(n=Count("product", distinct=True))
+    )
+
+    return {
+        "price": [(slug, label, totals[_alias("price", slug)]) for slug, label, _, _ in PRICE_BANDS],
+        "size": [(size, size, size_totals.get(size, 0)) for size in SIZE_VALUES],
+        "type": [(slug, label, totals[_alias("type", slug)]) for slug, label, _ in PRODUCT_TYPES],
+    }
+
+
+def facet_counts():
+    """
+    Returns the option counts for every facet.
+
+    Counts are computed once per catalog version and then served from the
+    cache, so they are refreshed exactly when a Product/ProductSize changes.
+    """
+    return cache.get_or_set(
+        f"catalog:facets:{catalog_version()}",
+        _compute_facet_counts,
+        PAGE_TIMEOUT,
+    )
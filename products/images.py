@@ -0,0 +1,84 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models import F, Q
+from PIL import Image, ImageOps
+
+from .models import Product
+
+
+VARIANT_WIDTHS = (320, 640, 960)
+
+# (key in Product.image_variants, Pillow format, save options)
+VARIANT_FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+VARIANT_DIR = "products/variants"
+
+
+def pending_products():
+    """
+    Products whose current image has no variants yet
+    (new uploads and replaced images).
+    """
+    return (
+        Product.objects.exclude(Q(image="") | Q(image__isnull=True))
+        .exclude(image_variants_source=F("image"))
+        .order_by("id")
+    )
+
+
+def _resize(image, width):
+    if width >= image.width:
+        return image
+    height = round(image.height * width / image.width)
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def build_image_variants(product):
+    """
+    Renders every width/format variant of the product's image with Pillow,
+    stores them next to the original and records them on the product.
+    Variants of a previously uploaded image are deleted.
+    """
+    storage = product.image.storage
+    source_name = product.image.name
+
+    with product.image.open("rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+
+    # Never upscale: widths beyond the original collapse into one variant
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+
+    variants = {}
+    for key, pillow_format, options in VARIANT_FORMATS:
+        variants[key] = []
+        for width in widths:
+            buffer = BytesIO()
+            _resize(image, width).save(buffer, pillow_format, **options)
+            name = storage.save(
+                f"{VARIANT_DIR}/{stem}-{width}w.{key}",
+                ContentFile(buffer.getvalue()),
+            )
+            variants[key].append([width, name])
+
+    for names in product.image_variants.values():
+        for _, name in names:
+            storage.delete(name)
+
+    # Only record the result if the image was not replaced meanwhile
+    Product.objects.filter(pk=product.pk, image=source_name).update(
+        image_variants=variants,
+        image_variants_source=source_name,
+    )
+    product.image_variants = variants
+    product.image_variants_source = source_name
+    return variants
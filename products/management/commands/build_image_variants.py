@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.cache import bump_catalog_version
+from products.images import build_image_variants, pending_products
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Builds resized WebP/JPEG variants for newly uploaded product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and pick up new uploads as they arrive.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=30,
+            help="Seconds to sleep between polls in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            built = self.build_pending()
+            if built:
+                # Cached catalog pages still point at the full-size images
+                bump_catalog_version()
+                self.stdout.write(self.style.SUCCESS(f"Built variants for {built} products."))
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+    def build_pending(self):
+        built = 0
+        for product in pending_products().iterator(chunk_size=50):
+            try:
+                build_image_variants(product)
+            except Exception as e:
+                self.stderr.write(f"Image variants failed for product {product.pk}: {e}")
+                # Serve the original instead of retrying a broken upload forever
+                Product.objects.filter(pk=product.pk).update(
+                    image_variants={},
+                    image_variants_source=product.image.name,
+                )
+                continue
+            built += 1
+        return built
@@ -0,0 +1,49 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from products.catalog import CSV_FIELDS, export_products, to_csv_row
+
+
+class Command(BaseCommand):
+    help = "Streams every product with its size stock to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-",
+            help="Output file (default: stdout).",
+        )
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"],
+            help="Output format (default: from the file extension, else csv).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Products fetched per database round trip.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+
+        out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+        try:
+            records = export_products(options["chunk_size"])
+            count = 0
+            if fmt == "csv":
+                writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+                writer.writeheader()
+                for record in records:
+                    writer.writerow(to_csv_row(record))
+                    count += 1
+            else:
+                for record in records:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        self.stderr.write(f"Exported {count} products.")
@@ -0,0 +1,76 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import CatalogError, clean_record, finish_import, from_csv_row, import_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Upserts products and their size stock from CSV or JSONL (as written "
+        "by export_catalog). Rows with an id update that product, rows "
+        "without one create a new product. Sizes a row leaves empty are not touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Input file, or - for stdin.")
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"],
+            help="Input format (default: from the file extension, else csv).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Products written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith(".jsonl") else "csv")
+
+        source = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        products = sizes = 0
+        try:
+            batch = []
+            for line, record in self.read(source, fmt):
+                try:
+                    batch.append(clean_record(record))
+                except CatalogError as e:
+                    raise CommandError(
+                        f"Line {line}: {e}. Batches before it were imported."
+                    )
+                if len(batch) == options["batch_size"]:
+                    written = import_batch(batch)
+                    products, sizes = products + written[0], sizes + written[1]
+                    batch = []
+
+            if batch:
+                written = import_batch(batch)
+                products, sizes = products + written[0], sizes + written[1]
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            finish_import()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {products} products and {sizes} size stock changes."
+        ))
+
+    def read(self, source, fmt):
+        """
+        Yields (line number, raw record) from the input stream.
+        """
+        if fmt == "csv":
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, from_csv_row(row)
+            return
+
+        for line, text in enumerate(source, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                raise CommandError(f"Line {line}: invalid JSON ({e}).")
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.cache import bump_catalog_version
+from products.models import Product, StaleStockSummary
+from products.stock import refresh_stale_summaries, refresh_stock_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the denormalized stock summary of every product, or with "
+        "--stale only of those whose refresh after a checkout failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of products refreshed per transaction.",
+        )
+        parser.add_argument(
+            "--stale", action="store_true",
+            help="Only refresh products left marked stale by a failed checkout refresh.",
+        )
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="With --stale: keep running and refresh stale products as they appear.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=60,
+            help="Seconds to sleep between runs in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            while True:
+                refreshed = refresh_stale_summaries()
+                if refreshed:
+                    self.stdout.write(self.style.SUCCESS(f"Refreshed stock summary of {refreshed} stale products."))
+                if not options["loop"]:
+                    return
+                time.sleep(options["interval"])
+
+        batch_size = options["batch_size"]
+        # Marks made before the rebuild are covered by it
+        last_mark = StaleStockSummary.objects.order_by("-id").values_list("id", flat=True).first()
+        product_ids = Product.objects.order_by("id").values_list("id", flat=True)
+
+        batch = []
+        refreshed = 0
+        for product_id in product_ids.iterator(chunk_size=batch_size):
+            batch.append(product_id)
+            if len(batch) == batch_size:
+                refresh_stock_summary(batch)
+                refreshed += len(batch)
+                batch = []
+
+        if batch:
+            refresh_stock_summary(batch)
+            refreshed += len(batch)
+
+        if last_mark is not None:
+            StaleStockSummary.objects.filter(id__lte=last_mark).delete()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed stock summary of {refreshed} products."))
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Pre-renders the anonymous catalog pages into the page cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages", type=int, default=3,
+            help="Number of infinite-scroll pages to warm after the first.",
+        )
+        parser.add_argument(
+            "--products", type=int, default=200,
+            help="Number of newest product detail pages to warm.",
+        )
+
+    def handle(self, *args, **options):
+        # Requests go through the full middleware stack, so use a host
+        # the site actually accepts
+        host = next(
+            (h.lstrip(".") for h in settings.ALLOWED_HOSTS if h != "*"),
+            "localhost",
+        )
+        client = Client(HTTP_HOST=host)
+        warmed = 0
+
+        for url in ("/", reverse("products:product_list")):
+            warmed += self._warm(client, url) is not None
+
+        # Follow the infinite scroll chain
+        url = reverse("products:product_list_page")
+        for _ in range(options["pages"]):
+            response = self._warm(client, url)
+            if response is None:
+                break
+            warmed += 1
+            url = response.get("X-Next-Page")
+            if not url:
+                break
+
+        product_ids = (
+            Product.objects.filter(available=True)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[:options["products"]]
+        )
+        for product_id in product_ids:
+            url = reverse("products:product_detail", args=[product_id])
+            warmed += self._warm(client, url) is not None
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed} catalog pages."))
+
+    def _warm(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            self.stderr.write(f"Skipped {url} (HTTP {response.status_code})")
+            return None
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_alter_productsize_order'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['available', '-created_at', '-id'], name='product_listing_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:42
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    PostgreSQL: GIN index over the stored tsvector.
+    SQLite: FTS5 shadow table keyed by product id.
+    Both are backfilled from existing products.
+    """
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX product_search_vector_idx "
+            "ON products_product USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE products_product SET search_vector = "
+            "setweight(to_tsvector('english'::regconfig, COALESCE(name, '')), 'A') || "
+            "setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'B')"
+        )
+
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE products_product_fts "
+            "USING fts5(name, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, description) "
+            "SELECT id, name, description FROM products_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS product_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_listing_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
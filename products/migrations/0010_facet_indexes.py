@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['available', 'price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productsize',
+            index=models.Index(fields=['product', 'size', 'stock'], name='productsize_stock_idx'),
+        ),
+    ]
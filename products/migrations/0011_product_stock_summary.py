@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:44
+
+from django.db import migrations, models
+
+
+SIZE_BITS = {"XS": 1, "S": 2, "M": 4, "L": 8, "XL": 16, "XXL": 32}
+
+
+def backfill_stock_summary(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductSize = apps.get_model("products", "ProductSize")
+
+    summaries = {}
+    for product_id, size, stock in ProductSize.objects.values_list("product_id", "size", "stock"):
+        summary = summaries.setdefault(product_id, [0, 0, 0])
+        summary[0] += stock
+        summary[1] |= SIZE_BITS.get(size, 0)
+        if stock > 0:
+            summary[2] |= SIZE_BITS.get(size, 0)
+
+    products = list(Product.objects.only("id", "has_sizes"))
+    for product in products:
+        total, size_mask, in_stock_mask = summaries.get(product.id, (0, 0, 0))
+        product.total_stock = total
+        product.size_mask = size_mask
+        product.in_stock_size_mask = in_stock_mask
+        product.in_stock = total > 0 if product.has_sizes else True
+
+    Product.objects.bulk_update(
+        products,
+        ["total_stock", "size_mask", "in_stock_size_mask", "in_stock"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='in_stock_size_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='size_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_stock_summary, migrations.RunPython.noop),
+    ]
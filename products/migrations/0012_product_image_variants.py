@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_stock_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_variants_source',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsize',
+            name='shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('product_size', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='products.productsize')),
+            ],
+            options={
+                'unique_together': {('product_size', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleStockSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+        ),
+    ]
@@ -1,5 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+
+# Written only by products.stock.refresh_stock_summary
+STOCK_SUMMARY_FIELDS = ["total_stock", "size_mask", "in_stock_size_mask", "in_stock"]
+
+# Written only by products.images.build_image_variants
+IMAGE_VARIANT_FIELDS = ["image_variants", "image_variants_source"]
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -10,9 +17,56 @@ class Product(models.Model):
     has_sizes = models.BooleanField(default=False) 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Maintained by products.search on PostgreSQL (GIN indexed there)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Stock summary of the product's sizes, maintained by products.stock
+    # so listings can show availability without touching ProductSize
+    total_stock = models.PositiveIntegerField(default=0, editable=False)
+    size_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    in_stock_size_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    in_stock = models.BooleanField(default=True, editable=False)
+
+    # Resized WebP/JPEG copies of `image`, built off the request path by
+    # the build_image_variants command: {"webp": [[width, name], ...], ...}
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    image_variants_source = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the storefront seeks on (created_at, id)
+            models.Index(
+                fields=["available", "-created_at", "-id"],
+                name="product_listing_idx",
+            ),
+            models.Index(fields=["available", "price"], name="product_price_idx"),
+        ]
+
     def __str__(self):
         return self.name
-    
+
+    def save(self, *args, **kwargs):
+        # Never write back a stale in-memory copy of the derived fields
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            derived = STOCK_SUMMARY_FIELDS + IMAGE_VARIANT_FIELDS
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in derived
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def size_options(self):
+        """
+        Sizes this product comes in, in display order, as (size, in_stock) pairs.
+        Read from the stock summary, so no ProductSize query is made.
+        """
+        return [
+            (size, bool(self.in_stock_size_mask & SIZE_BITS[size]))
+            for size, _ in SIZE_CHOICES
+            if self.size_mask & SIZE_BITS[size]
+        ]
+
 SIZE_CHOICES = [
     ("XS", "XS"),
     ("S", "S"),
@@ -31,6 +85,9 @@ SIZE_ORDER = {
     "XXL": 6,
 }
 
+# One bit per size for the Product stock summary masks
+SIZE_BITS = {size: 1 << (position - 1) for size, position in SIZE_ORDER.items()}
+
 class ProductSize(models.Model):
     product = models.ForeignKey(
         Product,
@@ -39,20 +96,69 @@ class ProductSize(models.Model):
     )
     size = models.CharField(max_length=5, choices=SIZE_CHOICES)
     stock = models.PositiveIntegerField(default=0)
+    # Hot sizes: split the stock over this many StockShard rows so
+    # concurrent checkouts do not queue on this row (0 = off)
+    shards = models.PositiveSmallIntegerField(default=0)
 
     order = models.PositiveIntegerField(editable=False, null=True, blank=True)
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets rebalance_shards tell an edited stock from a stale copy
+        instance._loaded_stock = instance.__dict__.get("stock")
+        return instance
+
     def save(self, *args, **kwargs):
         self.order = SIZE_ORDER.get(self.size, 99)
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ["order"]  # ✅ THIS fixes the display order
+        indexes = [
+            # In-stock size lookups (facet filter and counts)
+            models.Index(fields=["product", "size", "stock"], name="productsize_stock_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.size}"
 
+
+class StockShard(models.Model):
+    """
+    One slice of a sharded ProductSize's stock. The shards are the source
+    of truth; ProductSize.stock is their sum, synced after each checkout.
+    """
+    product_size = models.ForeignKey(
+        ProductSize,
+        related_name="stock_shards",
+        on_delete=models.CASCADE
+    )
+    index = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("product_size", "index")
+
+    def __str__(self):
+        return f"{self.product_size} #{self.index}"
+
+
+
+class StaleStockSummary(models.Model):
+    """
+    Marks a product whose stock changed in a checkout without its summary
+    being refreshed yet. Written in the checkout's transaction and deleted
+    by the refresh after commit; a mark left behind by a failed refresh is
+    picked up by rebuild_stock_summary --stale.
+    """
+    product = models.ForeignKey(Product, related_name="+", on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Stale stock summary of {self.product_id}"
+
     
 class Wishlist(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -0,0 +1,63 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+PAGE_SIZE = 24
+
+
+def encode_cursor(product):
+    """
+    Encodes the (created_at, id) position of a product as an opaque token.
+    """
+    raw = json.dumps([product.created_at.isoformat(), product.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor token back into (created_at, id).
+    Returns None for missing or malformed cursors.
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    Returns one page of products, newest first, plus the cursor for the next page.
+
+    Seeks on (created_at, id) instead of using OFFSET, so every page costs
+    the same single indexed query no matter how deep the shopper scrolls.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    # Fetch one extra row to know whether another page exists
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1])
+
+    return items, next_cursor
@@ -0,0 +1,118 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Product
+
+
+SEARCH_CONFIG = "english"
+SEARCH_LIMIT = 48
+
+# SQLite keeps an FTS5 shadow table keyed by product id (see migration 0009)
+FTS_TABLE = "products_product_fts"
+
+
+def _search_vector():
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def _fts_query(query):
+    """
+    Turns free text into a safe FTS5 expression: every word is quoted
+    (so operators typed by shoppers are not interpreted) and prefix-matched.
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def index_products(product_ids):
+    """
+    Refreshes the search index entries of the given products.
+    Called from Product saves; one statement per backend, not per product.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    if connection.vendor == "postgresql":
+        Product.objects.filter(id__in=product_ids).update(search_vector=_search_vector())
+
+    elif connection.vendor == "sqlite":
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+                product_ids,
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                f"SELECT id, name, description FROM products_product "
+                f"WHERE id IN ({placeholders})",
+                product_ids,
+            )
+
+
+def remove_products(product_ids):
+    """
+    Drops deleted products from the SQLite shadow table.
+    On PostgreSQL the vector lives on the row itself, so nothing is left behind.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or connection.vendor != "sqlite":
+        return
+
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})",
+            product_ids,
+        )
+
+
+def search_products(query, limit=SEARCH_LIMIT):
+    """
+    Returns available products matching the query, best matches first.
+    Name matches rank above description matches.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    if connection.vendor == "postgresql":
+        search_query = SearchQuery(query, search_type="websearch", config=SEARCH_CONFIG)
+        return list(
+            Product.objects.filter(available=True, search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-id")[:limit]
+        )
+
+    if connection.vendor == "sqlite":
+        match = _fts_query(query)
+        if not match:
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id FROM {FTS_TABLE} f "
+                f"JOIN products_product p ON p.id = f.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND p.available "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0), p.id DESC "
+                f"LIMIT %s",
+                [match, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+        products = Product.objects.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+    # Other backends have no index to use; keep the page working
+    return list(
+        Product.objects.filter(available=True)
+        .filter(Q(name__icontains=query) | Q(description__icontains=query))
+        .order_by("-created_at", "-id")[:limit]
+    )
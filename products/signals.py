@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .cache import bump_catalog_version
+from .models import Product, ProductSize
+from .stock import rebalance_shards, refresh_stock_summary
+
+
+# ==================================================
+# SEARCH INDEX
+# ==================================================
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    """
+    Keeps the product's search entry in step with its name and description.
+    """
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    """
+    Removes a deleted product from the search index.
+    """
+    search.remove_products([instance.pk])
+
+
+# ==================================================
+# STOCK SUMMARY
+# ==================================================
+
+@receiver(post_save, sender=Product)
+def summarize_saved_product(sender, instance, **kwargs):
+    """
+    has_sizes decides whether a product is stock-tracked at all.
+    """
+    refresh_stock_summary([instance.pk])
+
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def summarize_size_change(sender, instance, **kwargs):
+    """
+    Keeps the product's stock summary in the same transaction as the
+    size/stock change.
+    """
+    refresh_stock_summary([instance.product_id])
+
+
+# ==================================================
+# SHARDED STOCK
+# ==================================================
+
+@receiver(post_save, sender=ProductSize)
+def rebalance_size_shards(sender, instance, **kwargs):
+    """
+    A saved stock or shard count (e.g. an admin edit) is spread over the
+    shards anew. Checkout decrements shards directly and never saves the size.
+    """
+    rebalance_shards(instance)
+
+
+# ==================================================
+# CATALOG PAGE CACHE
+# ==================================================
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def invalidate_catalog_cache(sender, **kwargs):
+    """
+    Any product or size/stock change invalidates every cached catalog page.
+    Bumped after commit so a page rendered mid-transaction is never stored
+    under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
@@ -0,0 +1,218 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .cache import bump_catalog_version, bump_stock_version
+from .models import SIZE_BITS, STOCK_SUMMARY_FIELDS, Product, ProductSize, StaleStockSummary, StockShard
+
+
+def refresh_stock_summary(product_ids):
+    """
+    Recomputes the denormalized stock summary of the given products
+    from their ProductSize rows.
+
+    Runs in the caller's transaction (or its own), so the summary always
+    commits together with the stock change that caused it. Only products
+    whose summary moved are written.
+
+    Returns the ids of products whose in-stock flags or sizes changed,
+    i.e. what catalog pages and facets show; a new total_stock alone
+    does not count.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return set()
+
+    with transaction.atomic():
+        summaries = {pk: [0, 0, 0] for pk in product_ids}
+        rows = ProductSize.objects.filter(product_id__in=product_ids).values_list(
+            "product_id", "size", "stock"
+        )
+        for product_id, size, stock in rows:
+            summary = summaries[product_id]
+            bit = SIZE_BITS.get(size, 0)
+            summary[0] += stock
+            summary[1] |= bit
+            if stock > 0:
+                summary[2] |= bit
+
+        changed, shown_changed = [], set()
+        products = Product.objects.filter(id__in=product_ids).only("id", "has_sizes", *STOCK_SUMMARY_FIELDS)
+        for product in products:
+            total, size_mask, in_stock_mask = summaries[product.id]
+            # Products without sizes (sarees) are not stock-tracked
+            summary = (total, size_mask, in_stock_mask, total > 0 if product.has_sizes else True)
+            before = tuple(getattr(product, field) for field in STOCK_SUMMARY_FIELDS)
+            if summary == before:
+                continue
+            for field, value in zip(STOCK_SUMMARY_FIELDS, summary):
+                setattr(product, field, value)
+            changed.append(product)
+            if summary[1:] != before[1:]:
+                shown_changed.add(product.id)
+
+        Product.objects.bulk_update(changed, STOCK_SUMMARY_FIELDS)
+    return shown_changed
+
+
+def _stock_changed(shown_changed):
+    """
+    After a sale: the stock counts moved, but cached pages and facet
+    counts are only dropped when a product's in-stock flags did.
+    """
+    bump_stock_version()
+    if shown_changed:
+        bump_catalog_version()
+
+
+def refresh_stock_after_commit(product_ids):
+    """
+    Refreshes the stock summary of the given products once the current
+    transaction commits, so a checkout does not hold the Product row locks
+    until its end. The summary is recomputed from the committed stock, so
+    a late refresh is still correct.
+
+    The products are marked stale in the current transaction (an insert,
+    which does not contend with the summary updates) and unmarked by the
+    refresh. If the refresh fails it is logged instead of failing the
+    committed request, and the marks stay for refresh_stale_summaries.
+    """
+    product_ids = set(product_ids)
+    marks = StaleStockSummary.objects.bulk_create([
+        StaleStockSummary(product_id=product_id) for product_id in product_ids
+    ])
+
+    def refresh():
+        with transaction.atomic():
+            shown_changed = refresh_stock_summary(product_ids)
+            StaleStockSummary.objects.filter(id__in=[mark.id for mark in marks]).delete()
+        _stock_changed(shown_changed)
+
+    transaction.on_commit(refresh, robust=True)
+
+
+def refresh_stale_summaries():
+    """
+    Refreshes the products left marked stale by a failed refresh after
+    commit. Returns the number of products refreshed.
+    """
+    with transaction.atomic():
+        marks = list(StaleStockSummary.objects.values_list("id", "product_id"))
+        if not marks:
+            return 0
+        product_ids = {product_id for _, product_id in marks}
+        shown_changed = refresh_stock_summary(product_ids)
+        StaleStockSummary.objects.filter(id__in=[mark_id for mark_id, _ in marks]).delete()
+    _stock_changed(shown_changed)
+    return len(product_ids)
+
+
+# ==================================================
+# SHARDED STOCK
+# ==================================================
+
+def rebalance_shards(product_size):
+    """
+    Spreads the size's stock evenly over `shards` fresh StockShard rows,
+    or drops the shards when sharding is switched off.
+
+    The size row and then its shards are locked first, so a checkout that
+    is taking from a shard commits before the shards are replaced. Unless
+    the stock itself was edited, the old shards' total is what gets
+    spread: it already counts sales not yet synced to ProductSize.stock.
+    """
+    with transaction.atomic():
+        locked = ProductSize.objects.select_for_update().get(pk=product_size.pk)
+        shards = list(
+            StockShard.objects.select_for_update()
+            .filter(product_size=locked)
+            .order_by("index")
+        )
+
+        stock = locked.stock
+        if shards and product_size.stock == getattr(product_size, "_loaded_stock", None):
+            stock = sum(shard.stock for shard in shards)
+            if stock != locked.stock:
+                ProductSize.objects.filter(pk=locked.pk).update(stock=stock)
+                refresh_stock_summary([locked.product_id])
+        product_size.stock = product_size._loaded_stock = stock
+
+        StockShard.objects.filter(product_size=locked).delete()
+        count = locked.shards
+        if not count:
+            return
+
+        # Sharded sizes take no cart holds (see CartItem.objects.increment)
+        locked.reservations.all().delete()
+
+        share, extra = divmod(stock, count)
+        StockShard.objects.bulk_create([
+            StockShard(product_size=locked, index=i, stock=share + (i < extra))
+            for i in range(count)
+        ])
+
+
+def take_from_shards(product_size_id, quantity):
+    """
+    Removes quantity units from a sharded size. Must run in a transaction.
+
+    A random shard with enough stock that no other checkout has locked is
+    decremented, so concurrent buyers spread over the shards. When no
+    single shard can serve the quantity, all shards are locked (in index
+    order) and drained one after another.
+
+    Returns False if the shards hold fewer than quantity units in total.
+    """
+    shard = (
+        StockShard.objects.select_for_update(skip_locked=True)
+        .filter(product_size_id=product_size_id, stock__gte=quantity)
+        .order_by("?")
+        .first()
+    )
+    if shard is not None and StockShard.objects.filter(
+        pk=shard.pk, stock__gte=quantity
+    ).update(stock=F("stock") - quantity):
+        return True
+
+    shards = list(
+        StockShard.objects.select_for_update()
+        .filter(product_size_id=product_size_id)
+        .order_by("index")
+    )
+    if sum(shard.stock for shard in shards) < quantity:
+        return False
+
+    remaining = quantity
+    for shard in shards:
+        taken = min(shard.stock, remaining)
+        shard.stock -= taken
+        remaining -= taken
+    StockShard.objects.bulk_update(shards, ["stock"])
+    return True
+
+
+def sync_sharded_stock(product_size_ids):
+    """
+    Writes the shard totals back to ProductSize.stock and refreshes the
+    product summaries. Run after commit, so the ProductSize rows are only
+    touched once per checkout and outside its lock window.
+    """
+    product_size_ids = set(product_size_ids)
+    if not product_size_ids:
+        return
+
+    with transaction.atomic():
+        # A size without shard rows (yet) keeps its stock
+        ProductSize.objects.filter(id__in=product_size_ids).update(stock=Coalesce(
+            Subquery(
+                StockShard.objects.filter(product_size_id=OuterRef("pk"))
+                .values("product_size_id")
+                .annotate(total=Sum("stock"))
+                .values("total")
+            ),
+            F("stock"),
+        ))
+        shown_changed = refresh_stock_summary(
+            ProductSize.objects.filter(id__in=product_size_ids).values_list("product_id", flat=True)
+        )
+    _stock_changed(shown_changed)
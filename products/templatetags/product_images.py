@@ -0,0 +1,45 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+def _srcset(storage, variants):
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in variants)
+
+
+@register.simple_tag
+def product_picture(product, css_class="", sizes="100vw"):
+    """
+    Renders a product image as a lazy-loaded <picture> with WebP and JPEG
+    srcsets, falling back to the original upload until variants of the
+    current image exist (a replaced image keeps the old variants until
+    the worker catches up).
+    """
+    image = product.image
+    variants = product.image_variants or {}
+
+    if not variants.get("jpeg") or product.image_variants_source != image.name:
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="lazy">',
+            image.url, css_class, product.name,
+        )
+
+    storage = image.storage
+    jpeg = variants["jpeg"]
+    sources = format_html_join(
+        "",
+        '<source type="image/webp" srcset="{}" sizes="{}">',
+        [(_srcset(storage, variants["webp"]), sizes)] if variants.get("webp") else [],
+    )
+
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        sources,
+        storage.url(jpeg[-1][1]),
+        _srcset(storage, jpeg),
+        sizes,
+        css_class,
+        product.name,
+    )
@@ -1,3 +1,575 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import QueryDict
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from orders.models import Cart, CartItem, StockReservation
+from . import search
+from .cache import catalog_version, page_cache_key
+from .checks import shared_cache_check
+from .facets import facet_counts, filter_products, parse_filters
+from .images import build_image_variants
+from .models import SIZE_ORDER, Product, ProductSize, Wishlist, WishlistItem
+from .search import search_products
+from .stock import refresh_stock_after_commit, refresh_stock_summary
+
+
+# Query-budget helpers, shared with the orders and accounts tests
+
+SEED_SIZES = ("S", "M", "L")
+
+
+def seed_products(count, sized=True, name="Kurti", stock=20):
+    """
+    Bulk-creates count products (with S/M/L sizes in stock when sized)
+    and brings their stock summary and search index up to date, as the
+    catalog import does. Returns the products.
+    """
+    products = Product.objects.bulk_create([
+        Product(name=f"{name} {n}", description=f"{name} in cotton", price=10 + n, has_sizes=sized)
+        for n in range(count)
+    ])
+    if sized:
+        ProductSize.objects.bulk_create([
+            ProductSize(product=product, size=size, stock=stock, order=SIZE_ORDER[size])
+            for product in products
+            for size in SEED_SIZES
+        ])
+    product_ids = [product.id for product in products]
+    refresh_stock_summary(product_ids)
+    search.index_products(product_ids)
+    return products
+
+
+class QueryBudgetMixin:
+    """
+    Query-count assertions for view tests.
+
+    assertQueryBudget fails when a request runs more queries than its
+    budget. assertFlatQueries also runs the request again after the
+    fixtures have grown and fails if the count moved, which catches an
+    N+1 long before it reaches the budget. Both failures list the SQL.
+
+    Requests run under the configured cache, so a cache backend that
+    queries the database is counted too. The cache is cleared before
+    every measured request, so cached pages and badge counts never hide
+    queries.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _count_queries(self, request):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        return response, queries.captured_queries
+
+    def _format_queries(self, captured):
+        return "\n".join(f"{n}. {query['sql']}" for n, query in enumerate(captured, 1))
+
+    def assertQueryBudget(self, budget, request):
+        """
+        Runs request() and fails if it took more than budget queries.
+        Returns the response.
+        """
+        response, captured = self._count_queries(request)
+        if len(captured) > budget:
+            self.fail(
+                f"{len(captured)} queries, budget is {budget}:\n{self._format_queries(captured)}"
+            )
+        return response
+
+    def assertFlatQueries(self, budget, request, grow):
+        """
+        Runs request() on the current fixtures, calls grow() to enlarge
+        them, and runs request() again. Fails if either run exceeds the
+        budget or the second run needed more queries than the first.
+        Returns the second response.
+        """
+        _, small = self._count_queries(request)
+        grow()
+        response, large = self._count_queries(request)
+
+        if len(large) > len(small):
+            self.fail(
+                f"Query count grew with the data: {len(small)} -> {len(large)} queries.\n"
+                f"Small fixture:\n{self._format_queries(small)}\n"
+                f"Large fixture:\n{self._format_queries(large)}"
+            )
+        for captured in (small, large):
+            if len(captured) > budget:
+                self.fail(
+                    f"{len(captured)} queries, budget is {budget}:\n{self._format_queries(captured)}"
+                )
+        return response
+
+
+class CatalogImportExportTests(TestCase):
+    """
+    export_catalog output imports back unchanged; edited rows upsert
+    products and sizes in bulk and keep the derived fields current.
+    """
+
+    def setUp(self):
+        self.kurti = Product.objects.create(name="Kurti", description="Cotton", price="25.00", has_sizes=True)
+        ProductSize.objects.create(product=self.kurti, size="M", stock=4)
+        self.saree = Product.objects.create(name="Saree", description="Silk", price="80.00")
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def test_round_trip(self):
+        for name in ("catalog.csv", "catalog.jsonl"):
+            call_command("export_catalog", self._path(name), stderr=StringIO())
+            call_command("import_catalog", self._path(name), stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(ProductSize.objects.get().stock, 4)
+
+    def test_import_upserts_products_and_sizes(self):
+        path = self._path("catalog.jsonl")
+        with open(path, "w") as f:
+            f.write(f'{{"id": {self.kurti.id}, "name": "Kurti v2", "price": "30", "sizes": {{"M": 0, "XL": 2}}}}\n')
+            f.write('{"name": "New kurti", "price": "45.50", "sizes": {"S": 3}}\n')
+
+        call_command("import_catalog", path, batch_size=1, stdout=StringIO())
+
+        self.kurti.refresh_from_db()
+        self.assertEqual(self.kurti.name, "Kurti v2")
+        self.assertEqual(
+            list(self.kurti.sizes.values_list("size", "stock", "order")),
+            [("M", 0, 3), ("XL", 2, 5)],
+        )
+        self.assertEqual(self.kurti.total_stock, 2)
+
+        new = Product.objects.get(name="New kurti")
+        self.assertTrue(new.has_sizes)
+        self.assertEqual(new.total_stock, 3)
+
+    def test_bad_records_fail_on_their_line(self):
+        cases = {
+            '["Kurti", "30"]': "expected an object, got list",
+            '"Kurti"': "expected an object, got str",
+            '{"name": "Kurti", "price": "NaN"}': "price: must be a finite amount",
+            '{"name": "Kurti", "price": "-1"}': "price: must be a finite amount",
+            '{"name": "Kurti", "price": "30", "sizes": ["M"]}': "sizes: expected an object",
+            '{"name": "Kurti", "price": "123456789"}': "price: at most 8 digits, 2 after the point",
+            '{"name": "Kurti", "price": "10.999"}': "price: at most 8 digits, 2 after the point",
+            '{"name": "%s", "price": "30"}' % ("K" * 201): "name: at most 200 characters, got 201",
+        }
+        path = self._path("catalog.jsonl")
+        for line, error in cases.items():
+            with self.subTest(line):
+                with open(path, "w") as f:
+                    f.write('{"name": "Fine", "price": "10"}\n' + line + "\n")
+                with self.assertRaisesMessage(CommandError, f"Line 2: {error}"):
+                    call_command("import_catalog", path, batch_size=1, stdout=StringIO())
+
+
+class ProductViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every catalog and wishlist view runs a fixed number of queries,
+    however many products, sizes and wishlist items there are.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.products = seed_products(3)
+        self.user = User.objects.create_user("shopper", password="pw")
+        self.wishlist = Wishlist.objects.create(user=self.user)
+
+    def _wishlist(self, products):
+        return WishlistItem.objects.bulk_create([
+            WishlistItem(wishlist=self.wishlist, product=product) for product in products
+        ])
+
+    def _grow_catalog(self):
+        seed_products(60)
+
+    def test_product_list(self):
+        response = self.assertFlatQueries(
+            3, lambda: self.client.get(reverse("products:product_list")), self._grow_catalog
+        )
+        self.assertEqual(len(response.context["products"]), 24)
+
+    def test_product_list_page(self):
+        self.assertFlatQueries(1, lambda: self.client.get(reverse("products:product_list_page")), self._grow_catalog)
+
+    def test_search(self):
+        self.assertFlatQueries(2, lambda: self.client.get(reverse("products:search"), {"q": "kurti"}), self._grow_catalog)
+
+    def test_product_detail(self):
+        url = reverse("products:product_detail", args=[self.products[0].id])
+        response = self.assertFlatQueries(1, lambda: self.client.get(url), self._grow_catalog)
+        self.assertContains(response, self.products[0].name)
+
+    def test_wishlist(self):
+        self._wishlist(self.products)
+        self.client.force_login(self.user)
+        response = self.assertFlatQueries(
+            6,
+            lambda: self.client.get(reverse("products:wishlist")),
+            lambda: self._wishlist(seed_products(60)),
+        )
+        self.assertEqual(len(response.context["items"]), 63)
+
+    def test_add_to_wishlist(self):
+        new = iter(seed_products(2, name="Saree", sized=False))
+        self.client.force_login(self.user)
+        self.assertFlatQueries(
+            8,
+            lambda: self.client.post(reverse("products:add_to_wishlist", args=[next(new).id])),
+            lambda: self._wishlist(seed_products(60)),
+        )
+
+    def test_remove_from_wishlist(self):
+        items = iter(self._wishlist(self.products))
+        self.client.force_login(self.user)
+        self.assertFlatQueries(
+            4,
+            lambda: self.client.post(reverse("products:remove_from_wishlist", args=[next(items).id])),
+            lambda: self._wishlist(seed_products(60)),
+        )
+
+    def test_move_to_cart(self):
+        items = iter(self._wishlist(self.products))
+        self.client.force_login(self.user)
+        self.assertFlatQueries(
+            19,
+            lambda: self.client.post(
+                reverse("products:move_to_cart", args=[next(items).id]), {"size": "M"}
+            ),
+            lambda: self._wishlist(seed_products(60)),
+        )
+
+    def test_move_all_to_cart(self):
+        # Sized products already in the cart: each line is bumped and its
+        # stock hold refreshed, all in bulk
+        cart = Cart.objects.create(user=self.user)
+
+        def in_cart_and_wishlist(products):
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product=product, size="M") for product in products
+            ])
+            self._wishlist(products)
+
+        in_cart_and_wishlist(self.products)
+        self.client.force_login(self.user)
+        self.assertFlatQueries(
+            14,
+            lambda: self.client.post(reverse("products:move_all_to_cart"), {"all": "1", "size": "M"}),
+            lambda: in_cart_and_wishlist(seed_products(60)),
+        )
+        self.assertFalse(WishlistItem.objects.exists())
+        self.assertEqual(set(CartItem.objects.values_list("quantity", flat=True)), {2})
+        self.assertEqual(StockReservation.objects.count(), 63)
+
+
+class CatalogPageCacheTests(TestCase):
+    """
+    Anonymous catalog pages are served from the shared cache until the
+    catalog version moves; concurrent misses wait for one rebuild.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Kurti", description="Cotton", price="25.00")
+        self.url = reverse("products:product_detail", args=[self.product.id])
+
+    def test_version_bump_invalidates_pages(self):
+        self.assertContains(self.client.get(self.url), "Kurti")
+        with self.assertNumQueries(0):  # served by the configured cache alone
+            self.assertContains(self.client.get(self.url), "Kurti")
+
+        self.product.name = "Silk kurti"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()  # bumps the catalog version on commit
+
+        self.assertContains(self.client.get(self.url), "Silk kurti")
+
+    def test_concurrent_miss_waits_for_rebuild(self):
+        key = page_cache_key(RequestFactory().get(self.url))
+        cache.add(f"{key}:lock", 1, 30)  # another request is rebuilding
+
+        def rebuilt(seconds):
+            cache.set(key, (b"rebuilt page", {"Content-Type": "text/html"}), 60)
+
+        with mock.patch("products.cache.time.sleep", side_effect=rebuilt) as sleep:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.content, b"rebuilt page")
+        sleep.assert_called_once()
+
+    def test_deploy_check_wants_a_shared_memory_cache(self):
+        for backend, errors in (
+            ("django.core.cache.backends.locmem.LocMemCache", ["products.E001"]),
+            ("django.core.cache.backends.db.DatabaseCache", ["products.E002"]),
+            ("django.core.cache.backends.redis.RedisCache", []),
+        ):
+            with self.subTest(backend), override_settings(CACHES={"default": {"BACKEND": backend}}):
+                self.assertEqual([error.id for error in shared_cache_check(None)], errors)
+
+
+class CatalogApiConditionalTests(TestCase):
+    """
+    The API answers an unchanged catalog with 304 and a new ETag once the
+    catalog changes; errors carry no validators.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Kurti", description="Cotton", price="25.00")
+        self.url = reverse("api:product_detail", args=[self.product.id])
+
+    def test_not_modified_round_trip(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with self.assertNumQueries(0):  # the catalog version comes from the cache
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_after_catalog_write(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        self.product.price = 30
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["price"], "30.00")
+
+    def test_etag_changes_after_a_sale(self):
+        ProductSize.objects.create(product=self.product, size="M", stock=5)
+        etag = self.client.get(self.url)["ETag"]
+
+        ProductSize.objects.filter(product=self.product).update(stock=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_stock_after_commit([self.product.id])  # size still in stock
+
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_stock"], 4)
+
+    def test_errors_have_no_validators(self):
+        for url in (reverse("api:product_detail", args=[self.product.id + 1]), self.url + "?fields=bogus"):
+            response = self.client.get(url)
+            self.assertIn(response.status_code, (400, 404))
+            self.assertFalse(response.has_header("ETag"))
+            self.assertFalse(response.has_header("Last-Modified"))
+
+
+class ImageVariantTests(TestCase):
+    """
+    The image pipeline runs offline on local storage; pictures only use
+    variants made from the product's current image.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        storage = override_settings(
+            MEDIA_ROOT=self.dir.name,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+            },
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+
+    def _upload(self, name, size=(1200, 800)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "teal").save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def _picture(self, product):
+        return Template("{% load product_images %}{% product_picture product %}").render(
+            Context({"product": product})
+        )
+
+    def test_variants_srcset(self):
+        product = Product.objects.create(name="Kurti", description="-", price=10, image=self._upload("kurti.jpg"))
+
+        build_image_variants(product)
+        html = self._picture(Product.objects.get(pk=product.pk))
+
+        self.assertIn('<source type="image/webp"', html)
+        for width in (320, 640, 960):
+            self.assertIn(f"/media/products/variants/kurti-{width}w.webp {width}w", html)
+            self.assertIn(f"/media/products/variants/kurti-{width}w.jpeg {width}w", html)
+
+    def test_replaced_image_falls_back_to_original(self):
+        product = Product.objects.create(name="Kurti", description="-", price=10, image=self._upload("kurti.jpg"))
+        build_image_variants(product)
+
+        product = Product.objects.get(pk=product.pk)
+        product.image = self._upload("saree.jpg")
+        product.save()
+        html = self._picture(Product.objects.get(pk=product.pk))
+
+        self.assertNotIn("<picture>", html)
+        self.assertIn(f'src="/media/{product.image.name}"', html)
+
+
+class SearchTests(TestCase):
+    """
+    Full-text search ranks name matches first, takes shoppers' text
+    literally, and still answers on a backend without an index.
+    """
+
+    def setUp(self):
+        self.in_name = Product.objects.create(name="Silk kurti", description="Hand woven", price=10)
+        self.in_description = Product.objects.create(name="Dupatta", description="Goes with any kurti", price=10)
+        Product.objects.create(name="Cotton saree", description="Plain", price=10)
+        Product.objects.create(name="Old kurti", description="-", price=10, available=False)
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(search_products("kurti"), [self.in_name, self.in_description])
+
+    def test_prefix_and_operators(self):
+        self.assertEqual(search_products("kurt"), [self.in_name, self.in_description])
+        self.assertEqual(search_products('kurti" -silk ('), [self.in_name])  # no NOT, no syntax error
+        self.assertEqual(search_products("*"), [])
+
+    def test_edits_and_deletes_reach_the_index(self):
+        self.in_name.name = "Silk tunic"
+        self.in_name.save()
+        self.in_description.delete()
+
+        self.assertEqual(search_products("kurti"), [])
+        self.assertEqual(search_products("tunic"), [self.in_name])
+
+    def test_fallback_without_an_index(self):
+        with mock.patch.object(connection, "vendor", "other"):
+            found = search_products("KURTI")
+        self.assertEqual(set(found), {self.in_name, self.in_description})
+
+
+class FacetTests(TestCase):
+    """
+    Facet options filter the listing (OR within a facet, AND across
+    facets) and their counts follow the catalog.
+    """
+
+    def setUp(self):
+        self.cheap_kurti = Product.objects.create(name="Kurti", description="-", price=40, has_sizes=True)
+        ProductSize.objects.create(product=self.cheap_kurti, size="S", stock=2)
+        ProductSize.objects.create(product=self.cheap_kurti, size="M", stock=0)
+        self.kurti = Product.objects.create(name="Long kurti", description="-", price=120, has_sizes=True)
+        ProductSize.objects.create(product=self.kurti, size="M", stock=5)
+        self.saree = Product.objects.create(name="Saree", description="-", price=60)
+        Product.objects.create(name="Hidden saree", description="-", price=250, available=False)
+
+    def _filter(self, query):
+        filters = parse_filters(QueryDict(query))
+        return set(filter_products(Product.objects.filter(available=True), filters))
+
+    def test_unknown_options_are_ignored(self):
+        self.assertEqual(
+            parse_filters(QueryDict("price=under-50&price=free&size=M&size=XXXL&type=shoes")),
+            {"price": ["under-50"], "size": ["M"], "type": []},
+        )
+
+    def test_filters(self):
+        self.assertEqual(self._filter("price=under-50&price=100-200"), {self.cheap_kurti, self.kurti})
+        self.assertEqual(self._filter("price=under-50&price=50-100&type=saree"), {self.saree})
+        self.assertEqual(self._filter("size=M"), {self.kurti})  # the cheap kurti is out of M
+        self.assertEqual(self._filter(""), {self.cheap_kurti, self.kurti, self.saree})
+
+    def test_counts_follow_the_catalog(self):
+        counts = facet_counts()
+        self.assertEqual(counts["price"], [
+            ("under-50", "Under €50", 1), ("50-100", "€50 – €100", 1),
+            ("100-200", "€100 – €200", 1), ("200-plus", "€200 and above", 0),
+        ])
+        self.assertEqual(counts["type"], [("kurti", "Kurtis", 2), ("saree", "Sarees", 1)])
+        self.assertEqual({size: n for size, _, n in counts["size"]}["M"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            medium = ProductSize.objects.get(product=self.cheap_kurti, size="M")
+            medium.stock = 3
+            medium.save()  # bumps the catalog version on commit
+
+        self.assertEqual({size: n for size, _, n in facet_counts()["size"]}["M"], 2)
+
+    def test_sales_only_drop_facets_when_a_size_sells_out(self):
+        version = catalog_version()
+        sold = ProductSize.objects.filter(product=self.kurti, size="M")
+
+        sold.update(stock=4)  # as checkout does, bypassing the signals
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_stock_after_commit([self.kurti.id])
+        self.assertEqual(catalog_version(), version)
+        self.assertEqual(Product.objects.get(pk=self.kurti.pk).total_stock, 4)
+
+        sold.update(stock=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_stock_after_commit([self.kurti.id])
+        self.assertNotEqual(catalog_version(), version)
+        self.assertEqual({size: n for size, _, n in facet_counts()["size"]}["M"], 0)
+
+
+class StockSummaryTests(TestCase):
+    """
+    The denormalized stock summary on Product follows every size edit,
+    so listings never need to read ProductSize.
+    """
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Kurti", description="-", price=30, has_sizes=True)
+
+    def _summary(self):
+        product = Product.objects.get(pk=self.product.pk)
+        return product.total_stock, product.in_stock, product.size_options
+
+    def test_size_edits_keep_the_summary_current(self):
+        self.assertEqual(self._summary(), (0, False, []))
+
+        small = ProductSize.objects.create(product=self.product, size="S", stock=3)
+        large = ProductSize.objects.create(product=self.product, size="L", stock=0)
+        self.assertEqual(self._summary(), (3, True, [("S", True), ("L", False)]))
+
+        large.stock = 4
+        large.save()
+        small.stock = 0
+        small.save()
+        self.assertEqual(self._summary(), (4, True, [("S", False), ("L", True)]))
+
+        large.delete()
+        self.assertEqual(self._summary(), (0, False, [("S", False)]))
+
+    def test_products_without_sizes_are_always_in_stock(self):
+        ProductSize.objects.create(product=self.product, size="M", stock=0)
+        self.product.has_sizes = False
+        self.product.save()
+        self.assertTrue(Product.objects.get(pk=self.product.pk).in_stock)
+
+    def test_bulk_updates_are_refreshed_explicitly(self):
+        ProductSize.objects.create(product=self.product, size="M", stock=5)
+        ProductSize.objects.filter(product=self.product).update(stock=1)  # no signals
+        self.assertEqual(self._summary()[0], 5)
+
+        refresh_stock_summary([self.product.pk])
+        self.assertEqual(self._summary(), (1, True, [("M", True)]))
@@ -3,10 +3,13 @@ from . import views
 app_name = 'products'
 urlpatterns = [
     path('', views.product_list, name='product_list'),
+    path('page/', views.product_list_page, name='product_list_page'),
+    path('search/', views.search, name='search'),
     path('<int:product_id>/', views.product_detail, name='product_detail'),
     path('wishlist/', views.wishlist_view, name='wishlist'),
     path('wishlist/add/<int:product_id>/', views.add_to_wishlist, name='add_to_wishlist'),
     path('wishlist/remove/<int:item_id>/', views.remove_from_wishlist, name='remove_from_wishlist'),
     path('wishlist/move-to-cart/<int:item_id>/', views.move_to_cart, name='move_to_cart'),
+    path('wishlist/move-to-cart/', views.move_all_to_cart, name='move_all_to_cart'),
 
 ]
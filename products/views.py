@@ -1,9 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.urls import reverse
+from django.utils.http import urlencode
 
+from .cache import cache_catalog_page
+from .facets import facet_counts, filter_products, parse_filters
 from .models import Product, Wishlist, WishlistItem
-from products.models import ProductSize
+from .pagination import keyset_page
+from .search import search_products
+from orders.badges import adjust_badge
 from orders.models import Cart, CartItem
 
 
@@ -11,31 +17,80 @@ from orders.models import Cart, CartItem
 # PRODUCT LIST & DETAIL
 # ==================================================
 
+def _product_page(request):
+    """
+    Loads one keyset page of available products for the current cursor
+    and facet filters.
+    Returns the products, the active filters and the query string of the
+    next page (or None).
+    """
+    filters = parse_filters(request.GET)
+    products, next_cursor = keyset_page(
+        filter_products(Product.objects.filter(available=True), filters),
+        cursor=request.GET.get("cursor"),
+    )
+
+    next_query = None
+    if next_cursor:
+        next_query = urlencode({**filters, "cursor": next_cursor}, doseq=True)
+
+    return products, filters, next_query
+
+
+@cache_catalog_page
 def product_list(request):
     """
-    Displays all available products in the store.
+    Displays one page of available products in the store,
+    with facet filters and their option counts.
+    Further pages are appended by infinite scroll.
     """
-    products = Product.objects.all()
+    products, filters, next_query = _product_page(request)
     return render(request, 'products/product_list.html', {
-        'products': products
+        'products': products,
+        'filters': filters,
+        'facets': facet_counts(),
+        'next_query': next_query,
+    })
+
+
+@cache_catalog_page
+def product_list_page(request):
+    """
+    Returns the next page of product cards as an HTML fragment.
+    The URL of the following fragment is sent in the X-Next-Page header.
+    """
+    products, _, next_query = _product_page(request)
+    response = render(request, 'products/_product_cards.html', {
+        'products': products,
+    })
+    if next_query:
+        response["X-Next-Page"] = f"{reverse('products:product_list_page')}?{next_query}"
+    return response
+
+
+def search(request):
+    """
+    Ranked full-text search over product names and descriptions.
+    """
+    query = request.GET.get("q", "").strip()
+    products = search_products(query) if query else []
+
+    return render(request, "products/search.html", {
+        "query": query,
+        "products": products,
     })
 
 
+@cache_catalog_page
 def product_detail(request, product_id):
     """
     Displays details of a single product.
-    Loads available sizes only if the product has size variations.
+    Size availability comes from the product's stock summary.
     """
     product = get_object_or_404(Product, id=product_id)
 
-    sizes = []
-    if product.has_sizes:
-        # Related sizes are ordered via ProductSize model meta
-        sizes = product.sizes.all()
-
     return render(request, "products/product_detail.html", {
         "product": product,
-        "sizes": sizes,
     })
 
 
@@ -52,10 +107,12 @@ def add_to_wishlist(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     wishlist, _ = Wishlist.objects.get_or_create(user=request.user)
 
-    WishlistItem.objects.get_or_create(
+    _, created = WishlistItem.objects.get_or_create(
         wishlist=wishlist,
         product=product
     )
+    if created:
+        adjust_badge(request.user.id, "wishlist", 1)
 
     return redirect('products:wishlist')
 
@@ -66,7 +123,10 @@ def wishlist_view(request):
     Displays the current user's wishlist items.
     """
     wishlist, _ = Wishlist.objects.get_or_create(user=request.user)
-    items = wishlist.items.select_related('product')
+
+    # One query for every item and its product; sizes come from the
+    # product's stock summary, so the page cost does not grow with the list
+    items = list(wishlist.items.select_related('product').order_by('-id'))
 
     return render(request, 'products/wishlist.html', {
         'wishlist': wishlist,
@@ -85,6 +145,7 @@ def remove_from_wishlist(request, item_id):
         wishlist__user=request.user
     )
     item.delete()
+    adjust_badge(request.user.id, "wishlist", -1)
     return redirect('products:wishlist')
 
 
@@ -92,6 +153,56 @@ def remove_from_wishlist(request, item_id):
 # MOVE WISHLIST ITEM TO CART
 # ==================================================
 
+def _selected_size(request, item):
+    """
+    Size chosen for a wishlist item. The wishlist page names each item's
+    radio group size-<item id>; a plain "size" field is still accepted.
+    """
+    return request.POST.get(f"size-{item.id}") or request.POST.get("size")
+
+
+def _move_items_to_cart(request, wishlist_items):
+    """
+    Moves wishlist items into the user's cart.
+
+    All selected lines go into the cart through one add_units call, which
+    checks stock and holds units for sized products and upserts the cart
+    lines in bulk, so the cost does not grow with the number of items.
+    Moved wishlist items are removed with one delete.
+
+    Returns the number of items moved and a list of problems for the rest.
+    """
+    selected = []
+    problems = []
+    for item in wishlist_items:
+        size = None
+        if item.product.has_sizes:
+            size = _selected_size(request, item)
+            if not size:
+                problems.append(f"{item.product.name}: please select a size.")
+                continue
+        selected.append((item, size))
+
+    if not selected:
+        return 0, problems
+
+    cart, _ = Cart.objects.get_or_create(user=request.user)
+    added = CartItem.objects.add_units(cart.id, [(item.product, size) for item, size in selected])
+
+    moved = []
+    for item, size in selected:
+        if (item.product_id, size) in added:
+            moved.append(item.id)
+        else:
+            problems.append(f"{item.product.name}: size {size} is out of stock.")
+
+    WishlistItem.objects.filter(id__in=moved).delete()
+
+    adjust_badge(request.user.id, "cart", len(moved))
+    adjust_badge(request.user.id, "wishlist", -len(moved))
+    return len(moved), problems
+
+
 @login_required
 def move_to_cart(request, item_id):
     """
@@ -103,50 +214,45 @@ def move_to_cart(request, item_id):
         return redirect("products:wishlist")
 
     wishlist_item = get_object_or_404(
-        WishlistItem,
+        WishlistItem.objects.select_related("product"),
         id=item_id,
         wishlist__user=request.user
     )
-    product = wishlist_item.product
-    selected_size = None
 
-    # 🔹 Handle size-based products
-    if product.has_sizes:
-        selected_size = request.POST.get("size")
+    moved, problems = _move_items_to_cart(request, [wishlist_item])
+    if not moved:
+        messages.error(request, problems[0])
+        return redirect("products:wishlist")
 
-        if not selected_size:
-            messages.error(request, "Please select a size.")
-            return redirect("products:wishlist")
+    messages.success(request, "Moved to cart!")
+    return redirect("orders:cart")
 
-        # Validate selected size stock
-        ps = get_object_or_404(
-            ProductSize,
-            product=product,
-            size=selected_size
-        )
 
-        if ps.stock <= 0:
-            messages.error(request, "Selected size is out of stock.")
-            return redirect("products:wishlist")
+@login_required
+def move_all_to_cart(request):
+    """
+    Moves the selected wishlist items (or all of them) to the cart at once.
+    Items that need a size or are out of stock stay in the wishlist.
+    """
+    if request.method != "POST":
+        messages.error(request, "Invalid request.")
+        return redirect("products:wishlist")
 
-    # Get or create user's cart
-    cart, _ = Cart.objects.get_or_create(user=request.user)
+    items = WishlistItem.objects.filter(wishlist__user=request.user).select_related("product")
+    if not request.POST.get("all"):
+        items = items.filter(id__in=[i for i in request.POST.getlist("items") if i.isdigit()])
+    items = list(items)
 
-    # Ensure uniqueness by (cart, product, size)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart,
-        product=product,
-        size=selected_size,
-        defaults={"quantity": 1},
-    )
+    if not items:
+        messages.error(request, "Select at least one item to move.")
+        return redirect("products:wishlist")
 
-    # Increase quantity if item already exists
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    moved, problems = _move_items_to_cart(request, items)
+    for problem in problems:
+        messages.error(request, problem)
 
-    # Remove item from wishlist after moving to cart
-    wishlist_item.delete()
+    if not moved:
+        return redirect("products:wishlist")
 
-    messages.success(request, "Moved to cart!")
+    messages.success(request, f"Moved {moved} item{'s' if moved != 1 else ''} to cart!")
     return redirect("orders:cart")
@@ -75,6 +75,10 @@ document.addEventListener("DOMContentLoaded", function () {
             })
             .then(res => res.json())
             .then(data => {
+                if (data.applied === false && data.message) {
+                    alert(data.message);
+                }
+
                 if (data.removed) {
                     const row = document.getElementById(`cart-item-${itemId}`);
                     if (row) row.remove();
@@ -94,6 +98,59 @@ document.addEventListener("DOMContentLoaded", function () {
             });
         });
     });
+
+    /* =========================
+       INFINITE SCROLL (PRODUCTS)
+    ========================== */
+
+    const grid = document.getElementById("product-grid");
+    const loadMore = document.getElementById("load-more");
+
+    if (grid && loadMore && "IntersectionObserver" in window) {
+        let loading = false;
+
+        const loadNext = () => {
+            const nextUrl = loadMore.dataset.nextUrl;
+            if (!nextUrl || loading) return;
+            loading = true;
+
+            fetch(nextUrl, { headers: { "X-Requested-With": "XMLHttpRequest" } })
+            .then(res => {
+                if (!res.ok) throw new Error(`HTTP ${res.status}`);
+                const following = res.headers.get("X-Next-Page");
+                return res.text().then(html => ({ html, following }));
+            })
+            .then(({ html, following }) => {
+                grid.insertAdjacentHTML("beforeend", html);
+
+                if (following) {
+                    loadMore.dataset.nextUrl = following;
+                } else {
+                    observer.disconnect();
+                    loadMore.remove();
+                }
+            })
+            .catch(() => {
+                // Stop loading on scroll until the shopper asks again
+                observer.unobserve(loadMore);
+                loadMore.innerHTML =
+                    '<p class="text-muted mb-2">Could not load more products.</p>' +
+                    '<a href="#" class="btn btn-outline-dark">Retry</a>';
+                loadMore.querySelector("a").addEventListener("click", event => {
+                    event.preventDefault();
+                    loadMore.innerHTML = "";
+                    observer.observe(loadMore);
+                });
+            })
+            .finally(() => { loading = false; });
+        };
+
+        const observer = new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) loadNext();
+        }, { rootMargin: "400px" });
+
+        observer.observe(loadMore);
+    }
 });
 
 // CSRF helper